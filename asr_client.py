@@ -0,0 +1,106 @@
+import os
+import sys
+import json
+import wave
+import asyncio
+import argparse
+import numpy as np
+import websockets
+from audio_codecs import make_encoder
+
+# Настройки
+SERVER = os.environ.get("ASR_SERVER", "ws://192.168.0.18:2700/asr")
+SAMPLE_RATE = 16000
+BLOCK_SIZE = 4000  # Сэмплов в одном сообщении
+
+def print_event(event):
+    """Вывод события распознавания"""
+    if event.get("type") == "partial":
+        if event.get("partial"):
+            print(f"\rЧастично: {event['partial']}\033[K", end="", flush=True)
+    elif event.get("type") == "final":
+        if event.get("text"):
+            print(f"\rРаспознано: {event['text']}\033[K")
+    elif event.get("type") == "stats":
+        print(f"Передано {event['coded_bytes']} байт ({event['encoding']}) вместо "
+              f"{event['pcm_bytes']}, распаковка на сервере {event['cpu_seconds'] * 1000:.1f} мс")
+    else:
+        print(f"\nОшибка сервера: {event.get('error')}")
+
+async def receive_events(ws):
+    async for message in ws:
+        print_event(json.loads(message))
+
+async def send_block(ws, encoder, data):
+    """Сжатие блока и отправка того, что кодер уже выдал"""
+    coded = encoder.encode(np.frombuffer(data, dtype=np.int16))
+    if coded:
+        await ws.send(coded)
+
+async def send_wav(ws, path, realtime, encoding):
+    """Передача WAV-файла блоками"""
+    with wave.open(path, "rb") as wf:
+        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+            raise ValueError("нужен моно WAV PCM 16 бит")
+        rate = wf.getframerate()
+        encoder = make_encoder(encoding, rate)
+        await ws.send(json.dumps({"config": {"sample_rate": rate, "encoding": encoding}}))
+        while True:
+            data = wf.readframes(BLOCK_SIZE)
+            if not data:
+                break
+            await send_block(ws, encoder, data)
+            if realtime:
+                await asyncio.sleep(len(data) / 2 / rate)
+        tail = encoder.flush()
+        if tail:
+            await ws.send(tail)
+
+async def send_microphone(ws, device, encoding):
+    """Передача звука с микрофона"""
+    from audio_capture import CaptureEngine
+
+    capture = CaptureEngine(SAMPLE_RATE, BLOCK_SIZE, device)
+    encoder = make_encoder(encoding, SAMPLE_RATE)
+    loop = asyncio.get_running_loop()
+    await ws.send(json.dumps({"config": {"sample_rate": SAMPLE_RATE, "encoding": encoding}}))
+    with capture.open():
+        print("Говорите... (Ctrl+C для остановки)")
+        while True:
+            data = await loop.run_in_executor(None, capture.read_block, 1.0)
+            if data is not None:
+                await send_block(ws, encoder, data)
+
+async def run(args):
+    async with websockets.connect(args.server, max_size=2 ** 20) as ws:
+        receiver = asyncio.create_task(receive_events(ws))
+        try:
+            if args.wav:
+                await send_wav(ws, args.wav, args.realtime, args.encoding)
+            else:
+                await send_microphone(ws, args.device, args.encoding)
+            await ws.send(json.dumps({"eof": 1}))
+            await receiver
+        finally:
+            receiver.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Клиент сетевого распознавания речи")
+    parser.add_argument("--server", default=SERVER, help="адрес WebSocket сервера ASR")
+    parser.add_argument("--wav", help="WAV-файл вместо микрофона")
+    parser.add_argument("--realtime", action="store_true", help="передавать файл в темпе воспроизведения")
+    parser.add_argument("--device", type=int, help="номер устройства записи")
+    parser.add_argument("--encoding", default="pcm", choices=["pcm", "ulaw", "flac"],
+                        help="сжатие звука при передаче (flac требует pyflac)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("\n\nПрограмма остановлена пользователем.")
+    except (OSError, ValueError, websockets.WebSocketException) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Движок распознавания: KaldiRecognizer, VAD и рассылка событий подписчикам.
+
+Скрипты не разбирают PartialResult() сами, а подписываются на события:
+PartialEvent (промежуточный текст) и FinalEvent (законченная фраза).
+Промежуточный результат запрашивается не чаще partial_interval, сырая
+строка сравнивается с прошлой до разбора JSON, и неизменившийся текст
+подписчикам не отправляется. Один конвейер декодирования может кормить
+несколько потребителей: терминал, JSON-строки на stdout, локальный сокет.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import threading
+
+from vosk import KaldiRecognizer
+
+# Как часто запрашивать промежуточный результат, секунды (0 - на каждом блоке)
+PARTIAL_INTERVAL = float(os.environ.get("ASR_PARTIAL_INTERVAL", 0.3))
+
+
+class PartialEvent:
+    """Промежуточный результат фразы"""
+    type = "partial"
+
+    def __init__(self, text, stable=1, during_playback=False):
+        self.text = text
+        self.stable = stable  # Сколько проверок подряд текст не менялся
+        self.during_playback = during_playback  # Услышано, пока говорил сервер TTS
+        self.time = time.time()
+
+    def to_dict(self):
+        return {"type": self.type, "text": self.text, "stable": self.stable,
+                "during_playback": self.during_playback, "time": self.time}
+
+
+class FinalEvent:
+    """Законченная фраза; result - слова с временами, если они включены"""
+    type = "final"
+
+    def __init__(self, text, result=None, by_vad=False, during_playback=False):
+        self.text = text
+        self.result = result
+        self.by_vad = by_vad  # Фраза закрыта по концу речи от VAD, а не Kaldi
+        self.during_playback = during_playback
+        self.time = time.time()
+
+    def to_dict(self):
+        event = {"type": self.type, "text": self.text, "by_vad": self.by_vad,
+                 "during_playback": self.during_playback, "time": self.time}
+        if self.result is not None:
+            event["result"] = self.result
+        return event
+
+
+class RecognitionEngine:
+    """Распознаватель поверх общей модели с рассылкой событий
+
+    stable_after повторно отправляет неизменившийся промежуточный текст,
+    когда он продержался столько проверок подряд (для срабатывания команд).
+    gate (duplex.PlaybackGate) пропускает блоки, пока говорит сервер TTS;
+    в режиме barge-in блоки декодируются, а события помечаются during_playback.
+    """
+    def __init__(self, model, sample_rate, grammar=None, vad=None,
+                 partial_interval=PARTIAL_INTERVAL, stable_after=None, words=False,
+                 gate=None):
+        if grammar is None:
+            self.rec = KaldiRecognizer(model, sample_rate)
+        else:
+            self.rec = KaldiRecognizer(model, sample_rate, grammar)
+        if words:
+            self.rec.SetWords(True)
+        self.sample_rate = sample_rate
+        self.vad = vad
+        self.partial_interval = partial_interval
+        self.stable_after = stable_after
+        self.gate = gate
+        self.muted = False  # Текущий блок пришелся на речь сервера TTS
+        self.subscribers = []
+
+        self.last_raw = None  # Сырая строка последнего PartialResult()
+        self.last_text = ""
+        self.stable = 0
+        self.last_check = float("-inf")
+
+        # Счетчики
+        self.blocks = 0
+        self.partial_checks = 0
+        self.partial_parsed = 0
+        self.partials_sent = 0
+        self.finals_sent = 0
+        self.muted_blocks = 0
+        self.decode_seconds = 0.0
+
+    def subscribe(self, subscriber):
+        """subscriber(event) вызывается для каждого события в потоке декодера"""
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def _emit(self, event):
+        for subscriber in self.subscribers:
+            try:
+                subscriber(event)
+            except Exception as e:
+                print(f"\nОшибка подписчика {subscriber}: {e}", file=sys.stderr)
+
+    def reset(self):
+        """Сброс текущей фразы без финального результата"""
+        self.rec.Reset()
+        self._reset_partial()
+
+    def _reset_partial(self):
+        self.last_raw = None
+        self.last_text = ""
+        self.stable = 0
+
+    def _final(self, result_json, by_vad=False):
+        self._reset_partial()
+        result = json.loads(result_json)
+        text = result.get("text", "")
+        if text:
+            self.finals_sent += 1
+            self._emit(FinalEvent(text, result.get("result"), by_vad, self.muted))
+
+    def _partial(self):
+        now = time.monotonic()
+        if now - self.last_check < self.partial_interval:
+            return
+        self.last_check = now
+        self.partial_checks += 1
+
+        raw = self.rec.PartialResult()
+        if raw == self.last_raw:
+            # Тот же текст: JSON не разбираем и подписчикам не шлем,
+            # кроме одного повтора для stable_after
+            self.stable += 1
+            if self.last_text and self.stable == self.stable_after:
+                self.partials_sent += 1
+                self._emit(PartialEvent(self.last_text, self.stable, self.muted))
+            return
+
+        self.last_raw = raw
+        self.partial_parsed += 1
+        text = json.loads(raw).get("partial", "")
+        changed = text != self.last_text
+        # Состояние обновляется до рассылки: подписчик может вызвать reset()
+        self.stable = 1
+        self.last_text = text
+        if text and changed:
+            self.partials_sent += 1
+            self._emit(PartialEvent(text, during_playback=self.muted))
+
+    def accept(self, data):
+        """Очередной блок звука (bytes int16)"""
+        started = time.perf_counter()
+        self.blocks += 1
+
+        muted = self.gate is not None and self.gate.is_muted()
+        if muted and not self.gate.barge_in:
+            if not self.muted:
+                # Начало речи сервера: недослушанная фраза смешалась бы с ней
+                self.reset()
+            self.muted = True
+            self.muted_blocks += 1
+            return
+        self.muted = muted
+
+        if self.vad is None:
+            blocks = [data]
+        else:
+            blocks, speech_ended = self.vad.process(data)
+            if speech_ended:
+                # Конец фразы по VAD: финализируем, не дожидаясь Kaldi
+                self._final(self.rec.FinalResult(), by_vad=True)
+                self.rec.Reset()
+
+        for block in blocks:
+            if self.rec.AcceptWaveform(block):
+                self._final(self.rec.Result())
+            else:
+                self._partial()
+
+        self.decode_seconds += time.perf_counter() - started
+
+    def finish(self):
+        """Конец звука: последняя фраза отдается как финальная"""
+        self._final(self.rec.FinalResult())
+
+    def run(self, capture):
+        """Чтение блоков из CaptureEngine до конца входа (или Ctrl+C)"""
+        reported_overflows = 0
+        while True:
+            data = capture.read_block()
+            if data is None:
+                # Вход симулятора закончился
+                self.finish()
+                return
+
+            # Распознаватель отстает: часть звука отброшена кольцевым буфером
+            if capture.ring.overflows != reported_overflows:
+                reported_overflows = capture.ring.overflows
+                print(f"\nПереполнение буфера захвата, отброшено "
+                      f"{capture.ring.dropped_samples / self.sample_rate:.1f} с звука", file=sys.stderr)
+
+            self.accept(data)
+
+    def stats(self):
+        return {
+            "blocks": self.blocks,
+            "partial_checks": self.partial_checks,
+            "partial_parsed": self.partial_parsed,
+            "partials_sent": self.partials_sent,
+            "finals_sent": self.finals_sent,
+            "muted_blocks": self.muted_blocks,
+            "decode_seconds": round(self.decode_seconds, 3),
+        }
+
+
+class JsonLinesWriter:
+    """События по одному JSON на строку (stdout или файл)"""
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event.to_dict(), ensure_ascii=False) + "\n")
+        self.stream.flush()
+
+
+class SocketPublisher:
+    """Рассылка JSON-строк событий всем клиентам локального Unix-сокета
+
+    Клиент, который не успевает читать, отключается: декодер его не ждет.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.clients = []
+        self.lock = threading.Lock()
+
+        if os.path.exists(path):
+            os.unlink(path)
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            client.setblocking(False)
+            with self.lock:
+                self.clients.append(client)
+
+    def __call__(self, event):
+        line = (json.dumps(event.to_dict(), ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(line)
+                except OSError:
+                    # Отключился или переполнен буфер сокета
+                    client.close()
+                    self.clients.remove(client)
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close()
+            self.clients.clear()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from vosk import Model, KaldiRecognizer, SetLogLevel
+from audio_codecs import available_codecs, make_decoder
+
+# Настройки
+MODEL_PATH = os.environ.get("ASR_MODEL_PATH", "model")
+SAMPLE_RATE = 16000  # Частота по умолчанию, клиент может указать свою
+
+# Ограничения нагрузки
+MAX_SESSIONS = int(os.environ.get("ASR_MAX_SESSIONS", 4))
+DECODE_THREADS = int(os.environ.get("ASR_DECODE_THREADS", os.cpu_count() or 1))
+SESSION_QUEUE_CHUNKS = 8  # Сколько непрочитанных блоков может ждать декодера
+MAX_CHUNK_BYTES = 64 * 1024
+
+# Код закрытия WebSocket "попробуйте позже"
+WS_TRY_AGAIN_LATER = 1013
+
+# Глобальные переменные
+model = None  # Одна модель на все сессии
+decode_pool = None
+active_sessions = 0
+stats = {
+    "sessions_total": 0,
+    "sessions_rejected": 0,
+    "bytes_received": 0,  # После сжатия, как пришло по сети
+    "audio_seconds": 0.0,
+    "decode_seconds": 0.0,
+    "codec_seconds": 0.0,
+}
+stats_lock = threading.Lock()  # decode() выполняется в нескольких потоках
+
+class Session:
+    """Сессия распознавания: свой KaldiRecognizer поверх общей модели"""
+    def __init__(self, sample_rate, words=False, encoding="pcm"):
+        self.sample_rate = sample_rate
+        self.rec = KaldiRecognizer(model, sample_rate)
+        self.rec.SetWords(words)
+        self.last_partial = None
+        self.codec = make_decoder(encoding)  # Распаковка сжатого звука клиента
+        self.encoding = encoding
+        self.codec_open = True
+
+    def decode(self, data):
+        """Подача блока в декодер (выполняется в пуле потоков)"""
+        data = self.codec.decode(data)
+        if not data:
+            return None
+        started = time.perf_counter()
+        if self.rec.AcceptWaveform(data):
+            event = {"type": "final", **json.loads(self.rec.Result())}
+            self.last_partial = None
+        else:
+            partial = self.rec.PartialResult()
+            # Неизменившийся промежуточный результат клиенту не отправляем
+            if partial == self.last_partial:
+                event = None
+            else:
+                self.last_partial = partial
+                event = {"type": "partial", **json.loads(partial)}
+        with stats_lock:
+            stats["decode_seconds"] += time.perf_counter() - started
+            stats["audio_seconds"] += len(data) / 2 / self.sample_rate
+        return event
+
+    def close_codec(self):
+        """Остаток звука из декодера; для flac также останавливает его поток"""
+        if not self.codec_open:
+            return b""
+        self.codec_open = False
+        data = self.codec.flush()
+        with stats_lock:
+            stats["codec_seconds"] += self.codec.cpu_seconds
+        return data
+
+    def finish(self):
+        """Финальный результат по концу потока"""
+        data = self.close_codec()
+        if data:
+            self.rec.AcceptWaveform(data)
+        return {"type": "final", **json.loads(self.rec.FinalResult())}
+
+    def transport_stats(self):
+        """Объем переданного звука и стоимость его распаковки за сессию"""
+        return {"type": "stats", "encoding": self.encoding, **self.codec.stats()}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan контекстный менеджер"""
+    global model, decode_pool
+    print("Запуск сервера ASR...")
+
+    if not os.path.exists(MODEL_PATH):
+        raise RuntimeError(f"Папка модели '{MODEL_PATH}' не найдена")
+
+    SetLogLevel(-1)
+    model = Model(MODEL_PATH)
+    decode_pool = ThreadPoolExecutor(max_workers=DECODE_THREADS)
+    print(f"Модель загружена, сессий не больше {MAX_SESSIONS}, потоков декодера {DECODE_THREADS}")
+
+    yield
+
+    print("Остановка сервера ASR...")
+    decode_pool.shutdown(wait=False, cancel_futures=True)
+    print("Сервер остановлен")
+
+# Создаем FastAPI приложение
+app = FastAPI(lifespan=lifespan)
+
+async def receive_audio(ws: WebSocket, chunks: asyncio.Queue):
+    """Прием звука от клиента; при полной очереди чтение из сокета приостанавливается"""
+    while True:
+        message = await ws.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+        data = message.get("bytes")
+        if data is not None:
+            if len(data) > MAX_CHUNK_BYTES:
+                await ws.close(code=1003, reason="Слишком большой блок")
+                raise WebSocketDisconnect(1003)
+            stats["bytes_received"] += len(data)
+            # Ожидание здесь и есть обратное давление на клиента
+            await chunks.put(data)
+            continue
+
+        text = message.get("text") or "{}"
+        if json.loads(text).get("eof"):
+            await chunks.put(None)
+            return
+
+@app.websocket("/asr")
+async def asr_session(ws: WebSocket):
+    """Потоковое распознавание: бинарные блоки int16 PCM, в ответ JSON-события
+
+    Первым текстовым сообщением клиент может прислать
+    {"config": {"sample_rate": 16000, "words": true, "encoding": "ulaw"}},
+    конец потока - {"eof": 1}. Сжатые блоки (ulaw, flac) декодируются по мере прихода.
+    """
+    global active_sessions
+    await ws.accept()
+
+    if active_sessions >= MAX_SESSIONS:
+        stats["sessions_rejected"] += 1
+        await ws.send_json({"type": "error", "error": "Превышено число одновременных сессий"})
+        await ws.close(code=WS_TRY_AGAIN_LATER)
+        return
+
+    active_sessions += 1
+    stats["sessions_total"] += 1
+    loop = asyncio.get_running_loop()
+    receiver = None
+    session = None
+
+    try:
+        # Необязательная конфигурация сессии
+        sample_rate = SAMPLE_RATE
+        words = False
+        encoding = "pcm"
+        first = await ws.receive()
+        if first["type"] == "websocket.disconnect":
+            return
+        pending = None
+        if first.get("text"):
+            config = json.loads(first["text"]).get("config", {})
+            sample_rate = int(config.get("sample_rate", SAMPLE_RATE))
+            words = bool(config.get("words", False))
+            encoding = config.get("encoding", "pcm")
+            if encoding not in available_codecs():
+                await ws.send_json({"type": "error", "error": f"Кодек недоступен: {encoding}",
+                                    "encodings": available_codecs()})
+                await ws.close(code=1003)
+                return
+        elif first.get("bytes"):
+            pending = first["bytes"]
+
+        session = await loop.run_in_executor(decode_pool, Session, sample_rate, words, encoding)
+        chunks = asyncio.Queue(maxsize=SESSION_QUEUE_CHUNKS)
+        if pending:
+            stats["bytes_received"] += len(pending)
+            chunks.put_nowait(pending)
+        receiver = asyncio.create_task(receive_audio(ws, chunks))
+
+        while True:
+            get_chunk = asyncio.create_task(chunks.get())
+            done, _ = await asyncio.wait({get_chunk, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if get_chunk not in done:
+                # Прием завершился ошибкой или отключением
+                get_chunk.cancel()
+                receiver.result()
+                return
+
+            data = get_chunk.result()
+            if data is None:
+                break
+
+            event = await loop.run_in_executor(decode_pool, session.decode, data)
+            if event is not None:
+                await ws.send_json(event)
+
+        await ws.send_json(await loop.run_in_executor(decode_pool, session.finish))
+        await ws.send_json(session.transport_stats())
+        await ws.close()
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Ошибка в сессии распознавания: {e}")
+    finally:
+        if receiver is not None and not receiver.done():
+            receiver.cancel()
+        if session is not None:
+            # Сессия, оборванная клиентом, тоже освобождает декодер
+            await loop.run_in_executor(decode_pool, session.close_codec)
+        active_sessions -= 1
+
+@app.get("/status")
+async def get_status():
+    """Получение статуса сервера"""
+    return {
+        "status": "running",
+        "active_sessions": active_sessions,
+        "max_sessions": MAX_SESSIONS,
+        "decode_threads": DECODE_THREADS,
+        "encodings": available_codecs(),
+        **{k: round(v, 3) if isinstance(v, float) else v for k, v in stats.items()},
+    }
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=2700)
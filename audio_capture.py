@@ -0,0 +1,147 @@
+"""Захват звука с микрофона в предвыделенный кольцевой буфер.
+
+Callback аудиопотока копирует сэмплы прямо в заранее выделенный массив,
+без создания bytes и элементов очереди на каждый блок. Если распознаватель
+не успевает, буфер не растет: по выбранной политике отбрасываются либо
+самые старые (drop-oldest), либо самые новые (drop-newest) данные.
+"""
+import sys
+import time
+import threading
+
+import numpy as np
+
+import audio_io
+
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+
+
+class RingBuffer:
+    """Кольцевой буфер int16 фиксированного размера"""
+    def __init__(self, capacity, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Неизвестная политика переполнения: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.buf = np.zeros(capacity, dtype=np.int16)
+        # Абсолютные позиции; индекс в массиве - остаток от деления на capacity
+        self.read_pos = 0
+        self.write_pos = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+        # Счетчики
+        self.overflows = 0
+        self.dropped_samples = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        return self.write_pos - self.read_pos
+
+    def write(self, samples):
+        """Запись сэмплов (из callback аудиопотока)"""
+        with self.cond:
+            n = len(samples)
+            free = self.capacity - self.depth
+            if n > free:
+                self.overflows += 1
+                if self.policy == DROP_NEWEST:
+                    self.dropped_samples += n - free
+                    samples = samples[:free]
+                else:
+                    if n > self.capacity:
+                        self.dropped_samples += n - self.capacity
+                        samples = samples[-self.capacity:]
+                    # Освобождаем место, сдвигая позицию чтения
+                    overflow = len(samples) - free
+                    self.read_pos += overflow
+                    self.dropped_samples += overflow
+                n = len(samples)
+
+            if n:
+                start = self.write_pos % self.capacity
+                first = min(n, self.capacity - start)
+                self.buf[start:start + first] = samples[:first]
+                if first < n:
+                    self.buf[:n - first] = samples[first:]
+                self.write_pos += n
+
+            self.max_depth = max(self.max_depth, self.depth)
+            self.cond.notify()
+
+    def read(self, n, timeout=None):
+        """Чтение ровно n сэмплов в виде bytes; None по таймауту или после close()"""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.depth >= n or self.closed, timeout):
+                return None
+            if self.depth < n:
+                return None
+
+            start = self.read_pos % self.capacity
+            if start + n <= self.capacity:
+                data = self.buf[start:start + n].tobytes()
+            else:
+                first = self.capacity - start
+                data = self.buf[start:].tobytes() + self.buf[:n - first].tobytes()
+            self.read_pos += n
+            return data
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class CaptureEngine:
+    """Захват с микрофона блоками заданного размера"""
+    def __init__(self, samplerate, block_size, device=None, buffer_seconds=5.0,
+                 policy=DROP_OLDEST):
+        self.samplerate = samplerate
+        self.block_size = block_size
+        self.device = device
+        self.ring = RingBuffer(max(int(samplerate * buffer_seconds), block_size), policy)
+        self.status_errors = 0
+        self.stream = None
+
+    def callback(self, indata, frames, time, status):
+        """Функция обратного вызова для захвата аудио"""
+        if status:
+            self.status_errors += 1
+            print(f"Ошибка захвата: {status}", file=sys.stderr)
+        # Представление буфера PortAudio без копирования; копия одна - в кольцо
+        self.ring.write(np.frombuffer(indata, dtype=np.int16))
+
+    def open(self):
+        """Аудиопоток, готовый к использованию в with
+
+        Когда закончится вход симулятора, read_block() начнет возвращать None.
+        """
+        self.stream = audio_io.open_input(self.samplerate, self.block_size, self.device,
+                                          self.callback, on_finished=self.ring.close)
+        return self.stream
+
+    def read_block(self, timeout=None):
+        """Следующий блок в bytes для KaldiRecognizer.AcceptWaveform"""
+        return self.ring.read(self.block_size, timeout)
+
+    def read_latency(self):
+        """Сколько прошло с записи последнего прочитанного сэмпла (только в симуляторе)"""
+        if not isinstance(self.stream, audio_io.SimInputStream):
+            return None
+        return time.monotonic() - self.stream.time_of(self.ring.read_pos)
+
+    def stats(self):
+        ring = self.ring
+        return {
+            "block_size": self.block_size,
+            "policy": ring.policy,
+            "capacity": ring.capacity,
+            "depth": ring.depth,
+            "max_depth": ring.max_depth,
+            "overflows": ring.overflows,
+            "dropped_samples": ring.dropped_samples,
+            "dropped_seconds": round(ring.dropped_samples / self.samplerate, 3),
+            "status_errors": self.status_errors,
+        }
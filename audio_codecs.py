@@ -0,0 +1,216 @@
+"""Кодеки для передачи звука по сети блоками.
+
+Каждый кодер и декодер работает с потоком по частям: encode() и decode()
+принимают очередной блок и возвращают то, что уже готово, а flush() отдает
+остаток в конце потока. Объем данных и процессорное время кодека
+считаются в каждом объекте отдельно (на сессию).
+
+pcm  - без сжатия, int16;
+ulaw - G.711 mu-law, 8 бит на сэмпл (в 2 раза меньше, с потерями);
+flac - без потерь, нужен пакет pyflac.
+"""
+import threading
+import time
+
+import numpy as np
+
+try:
+    import pyflac
+except ImportError:
+    pyflac = None
+
+# Таблицы mu-law (как в G.711 и audioop): кодирование по всем 65536 значениям
+# int16 и декодирование по 256 байтам
+_ULAW_BIAS = 0x84
+_ULAW_SEG_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+
+
+def _build_ulaw_tables():
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    # Кодирование идет по 14 старшим битам
+    value = samples >> 2
+    mask = np.where(value < 0, 0x7F, 0xFF)
+    value = np.minimum(np.abs(value), 8159) + (_ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEG_END, value)
+    encoded = np.where(segment >= 8, 0x7F,
+                       (segment << 4) | ((value >> (segment + 1)) & 0x0F)) ^ mask
+    # Индекс таблицы кодирования - сэмпл, прочитанный как uint16
+    encode_table = np.empty(65536, dtype=np.uint8)
+    encode_table[samples.astype(np.uint16)] = encoded
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + _ULAW_BIAS) << exponent) - _ULAW_BIAS
+    decode_table = np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+    return encode_table, decode_table
+
+
+_ULAW_ENCODE, _ULAW_DECODE = _build_ulaw_tables()
+
+
+class _Codec:
+    """Общий учет: байты до и после кодека и процессорное время"""
+    def __init__(self):
+        self.pcm_bytes = 0
+        self.coded_bytes = 0
+        self.cpu_seconds = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "pcm_bytes": self.pcm_bytes,
+            "coded_bytes": self.coded_bytes,
+            "ratio": round(self.pcm_bytes / self.coded_bytes, 3) if self.coded_bytes else None,
+            "cpu_seconds": round(self.cpu_seconds, 4),
+        }
+
+
+class PcmEncoder(_Codec):
+    def encode(self, samples: np.ndarray) -> bytes:
+        data = samples.astype(np.int16, copy=False).tobytes()
+        self.pcm_bytes += len(data)
+        self.coded_bytes += len(data)
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class PcmDecoder(_Codec):
+    def __init__(self):
+        super().__init__()
+        self.tail = b""
+
+    def decode(self, data: bytes) -> bytes:
+        # Сэмпл мог разорваться между сообщениями
+        self.coded_bytes += len(data)
+        data = self.tail + data
+        cut = len(data) - len(data) % 2
+        self.tail = data[cut:]
+        self.pcm_bytes += cut
+        return data[:cut]
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class UlawEncoder(_Codec):
+    def encode(self, samples: np.ndarray) -> bytes:
+        started = time.thread_time()
+        data = _ULAW_ENCODE[samples.astype(np.int16, copy=False).view(np.uint16)].tobytes()
+        self.cpu_seconds += time.thread_time() - started
+        self.pcm_bytes += len(samples) * 2
+        self.coded_bytes += len(data)
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class UlawDecoder(_Codec):
+    def decode(self, data: bytes) -> bytes:
+        started = time.thread_time()
+        pcm = _ULAW_DECODE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+        self.cpu_seconds += time.thread_time() - started
+        self.coded_bytes += len(data)
+        self.pcm_bytes += len(pcm)
+        return pcm
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class FlacEncoder(_Codec):
+    """FLAC-поток: кадры выдаются по мере заполнения блока кодера"""
+    def __init__(self, sample_rate: int, compression_level: int = 5, blocksize: int = 1024):
+        super().__init__()
+        self.out = []
+        self.encoder = pyflac.StreamEncoder(sample_rate, self._write,
+                                            compression_level=compression_level,
+                                            blocksize=blocksize)
+
+    def _write(self, buffer, num_bytes, num_samples, current_frame):
+        self.out.append(bytes(buffer))
+
+    def _take(self) -> bytes:
+        data = b"".join(self.out)
+        self.out.clear()
+        self.coded_bytes += len(data)
+        return data
+
+    def encode(self, samples: np.ndarray) -> bytes:
+        if len(samples) == 0:
+            return b""
+        started = time.thread_time()
+        self.encoder.process(samples.astype(np.int16, copy=False))
+        self.cpu_seconds += time.thread_time() - started
+        self.pcm_bytes += len(samples) * 2
+        return self._take()
+
+    def flush(self) -> bytes:
+        started = time.thread_time()
+        self.encoder.finish()
+        self.cpu_seconds += time.thread_time() - started
+        return self._take()
+
+
+class FlacDecoder(_Codec):
+    """Декодер pyflac работает в своем потоке; готовый PCM забирается при каждом вызове"""
+    def __init__(self):
+        super().__init__()
+        self.out = []
+        self.lock = threading.Lock()
+        self.decoder_cpu = 0.0  # thread_time потока декодера на момент последнего блока
+        self.decoder = pyflac.StreamDecoder(self._write)
+
+    def _write(self, audio, sample_rate, num_channels, num_samples):
+        # Вызывается из потока декодера: приращение его времени - работа кодека
+        now = time.thread_time()
+        pcm = audio.astype(np.int16, copy=False).tobytes()
+        with self.lock:
+            self.cpu_seconds += now - self.decoder_cpu
+            self.decoder_cpu = now
+            self.out.append(pcm)
+
+    def _take(self) -> bytes:
+        with self.lock:
+            data = b"".join(self.out)
+            self.out.clear()
+        self.pcm_bytes += len(data)
+        return data
+
+    def decode(self, data: bytes) -> bytes:
+        # Пустой блок в очереди pyflac останавливает декодер
+        if data:
+            self.coded_bytes += len(data)
+            self.decoder.process(data)
+        return self._take()
+
+    def flush(self) -> bytes:
+        self.decoder.finish()
+        return self._take()
+
+
+def available_codecs() -> list:
+    """Кодеки, доступные в этой установке"""
+    return ["pcm", "ulaw"] + (["flac"] if pyflac is not None else [])
+
+
+def make_encoder(name: str, sample_rate: int):
+    if name == "pcm":
+        return PcmEncoder()
+    if name == "ulaw":
+        return UlawEncoder()
+    if name == "flac" and pyflac is not None:
+        return FlacEncoder(sample_rate)
+    raise ValueError(f"Кодек недоступен: {name}")
+
+
+def make_decoder(name: str):
+    if name == "pcm":
+        return PcmDecoder()
+    if name == "ulaw":
+        return UlawDecoder()
+    if name == "flac" and pyflac is not None:
+        return FlacDecoder()
+    raise ValueError(f"Кодек недоступен: {name}")
@@ -0,0 +1,327 @@
+"""Аудиоввод и вывод с выбором бэкенда: настоящие устройства или симулятор.
+
+AUDIO_BACKEND=sounddevice (по умолчанию) - микрофон и динамик через sounddevice.
+AUDIO_BACKEND=sim - без устройств и PulseAudio:
+  захват читает WAV-файлы из AUDIO_SIM_INPUT (через запятую) в темпе
+  воспроизведения, ускоренно (AUDIO_SIM_SPEED=4) или без пауз (0);
+  вывод собирает звук в буфер с отметками времени каждого фрагмента и при
+  закрытии сохраняет его в AUDIO_SIM_OUTPUT (WAV), если путь задан.
+
+Потоки симулятора повторяют интерфейс sounddevice (callback, with, write),
+поэтому код захвата и воспроизведения одинаков для обоих бэкендов.
+"""
+import os
+import sys
+import time
+import wave
+import threading
+
+import numpy as np
+
+BACKEND = os.environ.get("AUDIO_BACKEND", "sounddevice")
+SIM_INPUT = os.environ.get("AUDIO_SIM_INPUT", "")
+SIM_SPEED = float(os.environ.get("AUDIO_SIM_SPEED", 1.0))  # 0 - без пауз
+SIM_GAP_SECONDS = float(os.environ.get("AUDIO_SIM_GAP", 1.0))  # Тишина после каждого файла
+SIM_OUTPUT = os.environ.get("AUDIO_SIM_OUTPUT") or None
+
+SIM_DEVICE_ID = 0
+SIM_DEVICE_PREFIX = "sim:"  # Устройство симулятора с одним файлом: "sim:<путь>"
+
+# Потоки симулятора для отчета sim_report()
+sim_streams = []
+
+
+def is_simulated() -> bool:
+    return BACKEND == "sim"
+
+
+def find_input_device(hint: str = "USB"):
+    """ID устройства записи, в имени которого есть hint; None, если не найдено"""
+    if is_simulated():
+        print(f" Найдено устройство: симулятор ({SIM_INPUT or 'тишина'}) (ID: {SIM_DEVICE_ID})")
+        return SIM_DEVICE_ID
+
+    import sounddevice as sd
+    for i, dev in enumerate(sd.query_devices()):
+        if hint in dev['name'] and dev['max_input_channels'] > 0:
+            print(f" Найдено устройство: {dev['name']} (ID: {i})")
+            return i
+    return None
+
+
+def list_input_devices() -> list:
+    """Все устройства записи: [(ID, имя)]; в симуляторе - по одному на WAV-файл"""
+    if is_simulated():
+        return [(SIM_DEVICE_PREFIX + path, path) for path in sim_input_files()]
+
+    import sounddevice as sd
+    return [(i, dev['name']) for i, dev in enumerate(sd.query_devices())
+            if dev['max_input_channels'] > 0]
+
+
+def sim_input_files() -> list:
+    return [path.strip() for path in SIM_INPUT.split(",") if path.strip()]
+
+
+def open_input(samplerate, blocksize, device, callback, on_finished=None):
+    """Поток записи int16 моно; callback(indata, frames, time, status) как в sounddevice
+
+    on_finished вызывается симулятором, когда файлы закончились.
+    """
+    if is_simulated():
+        if isinstance(device, str) and device.startswith(SIM_DEVICE_PREFIX):
+            files = [device[len(SIM_DEVICE_PREFIX):]]
+        else:
+            files = sim_input_files()
+        return SimInputStream(samplerate, blocksize, callback, files, SIM_SPEED, on_finished)
+
+    import sounddevice as sd
+    return sd.RawInputStream(samplerate=samplerate, blocksize=blocksize, device=device,
+                             dtype='int16', channels=1, callback=callback)
+
+
+def open_output(samplerate, blocksize, callback=None, device=None, latency='high'):
+    """Поток вывода int16 моно
+
+    С callback(outdata, frames, time, status) поток сам запрашивает данные,
+    без него звук передается через write(bytes).
+    """
+    if is_simulated():
+        return SimOutputStream(samplerate, blocksize, callback, SIM_SPEED, SIM_OUTPUT)
+
+    import sounddevice as sd
+    if callback is None:
+        return sd.RawOutputStream(samplerate=samplerate, channels=1, dtype='int16',
+                                  blocksize=blocksize, device=device, latency=latency)
+    return sd.OutputStream(samplerate=samplerate, channels=1, dtype='int16',
+                           blocksize=blocksize, device=device, latency=latency,
+                           callback=callback)
+
+
+def sim_report() -> list:
+    """Статистика всех потоков симулятора"""
+    return [stream.stats() for stream in sim_streams]
+
+
+def read_wav(path, samplerate) -> np.ndarray:
+    """WAV-файл как int16 моно с нужной частотой"""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: нужен WAV PCM 16 бит")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != samplerate and len(audio):
+        n_out = int(round(len(audio) * samplerate / rate))
+        positions = np.arange(n_out) * (rate / samplerate)
+        audio = np.interp(positions, np.arange(len(audio)), audio).astype(np.int16)
+    return audio
+
+
+class SimStatus:
+    """Флаги callback, как у sounddevice.CallbackFlags; в симуляторе сбоев нет"""
+    input_overflow = False
+    output_underflow = False
+
+    def __bool__(self):
+        return False
+
+
+class _SimStream:
+    """Общее для потоков симулятора: фоновый поток и часы с ускорением"""
+    def __init__(self, samplerate, blocksize, speed):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.speed = speed
+        self.thread = None
+        self.running = threading.Event()
+        self.started_at = None  # time.monotonic() запуска
+        self.position = 0  # Сэмплов, прошедших через поток
+        self.threaded = True  # Данные гонит свой поток (как callback устройства)
+        sim_streams.append(self)
+
+    def time_of(self, sample: int) -> float:
+        """Момент (time.monotonic), когда сэмпл проходит через устройство"""
+        if self.speed <= 0:
+            return time.monotonic()
+        return self.started_at + sample / self.samplerate / self.speed
+
+    def _wait_until(self, sample: int):
+        if self.speed > 0:
+            delay = self.time_of(sample) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def start(self):
+        if self.running.is_set():
+            return
+        self.started_at = time.monotonic()
+        self.running.set()
+        if self.threaded:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5.0)
+        self.thread = None
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stats(self) -> dict:
+        wall = time.monotonic() - self.started_at if self.started_at is not None else 0.0
+        audio_seconds = self.position / self.samplerate
+        return {
+            "samplerate": self.samplerate,
+            "speed": self.speed,
+            "audio_seconds": round(audio_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "realtime_factor": round(audio_seconds / wall, 2) if wall > 0 else None,
+        }
+
+
+class SimInputStream(_SimStream):
+    """Захват из WAV-файлов блоками по blocksize сэмплов"""
+    def __init__(self, samplerate, blocksize, callback, files, speed=1.0, on_finished=None):
+        super().__init__(samplerate, blocksize, speed)
+        self.callback = callback
+        self.on_finished = on_finished
+        self.files = files
+        self.finished = False
+        # Границы файлов в потоке: (путь, первый сэмпл, сэмпл после последнего)
+        self.marks = []
+
+        parts = []
+        gap = np.zeros(int(SIM_GAP_SECONDS * samplerate), dtype=np.int16)
+        offset = 0
+        for path in files:
+            audio = read_wav(path, samplerate)
+            self.marks.append((path, offset, offset + len(audio)))
+            parts += [audio, gap]
+            offset += len(audio) + len(gap)
+        self.audio = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+        # Неполный последний блок дополняем тишиной
+        tail = -len(self.audio) % blocksize
+        if tail:
+            self.audio = np.concatenate([self.audio, np.zeros(tail, dtype=np.int16)])
+
+    def _run(self):
+        status = SimStatus()
+        try:
+            while self.running.is_set() and self.position + self.blocksize <= len(self.audio):
+                end = self.position + self.blocksize
+                # Блок готов, когда его последний сэмпл "записан"
+                self._wait_until(end)
+                block = self.audio[self.position:end]
+                self.position = end
+                self.callback(block.tobytes(), self.blocksize, None, status)
+        except Exception as e:
+            print(f"Ошибка в симуляторе захвата: {e}", file=sys.stderr)
+        self.finished = True
+        if self.on_finished is not None:
+            self.on_finished()
+
+    def stats(self) -> dict:
+        return {"kind": "input", "files": len(self.files), "finished": self.finished,
+                **super().stats()}
+
+
+class SimOutputStream(_SimStream):
+    """Вывод в буфер: звучащие участки сохраняются с отметками времени"""
+    def __init__(self, samplerate, blocksize, callback=None, speed=1.0, output_path=None):
+        super().__init__(samplerate, blocksize, speed)
+        self.callback = callback
+        self.output_path = output_path
+        self.lock = threading.Lock()
+        self.chunks = []  # Звучащие блоки (np.ndarray int16)
+        # Непрерывные участки звука: start/end - time.monotonic, sample - позиция в потоке
+        self.segments = []
+        self.in_segment = False
+        # Без callback звук приходит через write(); часы пускаются при первой записи
+        self.threaded = callback is not None
+
+    def _record(self, block: np.ndarray, start_sample: int):
+        """Учет блока, который устройство проиграло бы начиная с start_sample"""
+        with self.lock:
+            if not np.any(block):
+                self.in_segment = False
+                return
+            self.chunks.append(block.copy())
+            end_time = self.time_of(start_sample + len(block))
+            if self.in_segment:
+                segment = self.segments[-1]
+                segment["end"] = end_time
+                segment["samples"] += len(block)
+            else:
+                self.segments.append({"start": self.time_of(start_sample), "end": end_time,
+                                      "sample": start_sample, "samples": len(block)})
+                self.in_segment = True
+
+    def _run(self):
+        status = SimStatus()
+        outdata = np.zeros((self.blocksize, 1), dtype=np.int16)
+        try:
+            while self.running.is_set():
+                outdata[:] = 0
+                self.callback(outdata, self.blocksize, None, status)
+                start = self.position
+                self.position += self.blocksize
+                self._record(outdata[:, 0], start)
+                # Следующий блок запрашивается, когда текущий доигран;
+                # без пауз (speed 0) в тишине ждем как обычно, чтобы не крутить процессор
+                if self.speed > 0:
+                    self._wait_until(self.position)
+                elif not np.any(outdata):
+                    time.sleep(self.blocksize / self.samplerate)
+        except Exception as e:
+            print(f"Ошибка в симуляторе вывода: {e}", file=sys.stderr)
+
+    def write(self, data):
+        """Запись без callback; блокируется на время звучания, как устройство"""
+        if not self.running.is_set():
+            self.start()
+        block = np.frombuffer(data, dtype=np.int16)
+        start = self.position
+        self.position += len(block)
+        self._record(block, start)
+        self._wait_until(self.position)
+        return False  # Как у sounddevice: underflow не было
+
+    def audio(self) -> np.ndarray:
+        """Весь записанный звук без пауз между участками"""
+        with self.lock:
+            return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.int16)
+
+    def close(self):
+        super().close()
+        if self.output_path:
+            try:
+                with wave.open(self.output_path, "wb") as wf:
+                    wf.setnchannels(1)
+                    wf.setsampwidth(2)
+                    wf.setframerate(self.samplerate)
+                    wf.writeframes(self.audio().tobytes())
+            except OSError as e:
+                print(f"Не удалось сохранить вывод симулятора: {e}", file=sys.stderr)
+
+    def stats(self) -> dict:
+        with self.lock:
+            segments = [{"start": round(s["start"] - self.started_at, 3),
+                         "end": round(s["end"] - self.started_at, 3),
+                         "seconds": round(s["samples"] / self.samplerate, 3)}
+                        for s in self.segments[-20:]]
+            sound_seconds = sum(len(chunk) for chunk in self.chunks) / self.samplerate
+        return {"kind": "output", "sound_seconds": round(sound_seconds, 3),
+                "segments": segments, **super().stats()}
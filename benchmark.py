@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""Офлайн-бенчмарк синтеза Piper и распознавания Vosk без аудиоустройств.
+
+Примеры:
+  python3 benchmark.py tts --voices-dir /root/tts-server tts/tts-server/hello-repka-pi.txt
+  python3 benchmark.py asr --model model records/*.wav --output asr.json
+"""
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+import contextlib
+import platform
+import resource
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent
+TTS_SERVER_DIR = ROOT / "tts" / "tts-server"
+
+# Как в recognizer.py
+ASR_BLOCK_SIZE = 8000
+
+
+def collect_files(paths, suffix):
+    """Файлы из списка путей; каталоги раскрываются по расширению"""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(path.glob(f"*{suffix}")))
+        else:
+            files.append(path)
+    return files
+
+
+def percentiles(values):
+    """Перцентили задержек в миллисекундах"""
+    if not values:
+        return None
+    ms = np.asarray(values) * 1000.0
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 2),
+        "p90": round(float(np.percentile(ms, 90)), 2),
+        "p99": round(float(np.percentile(ms, 99)), 2),
+        "max": round(float(ms.max()), 2),
+    }
+
+
+def peak_rss_bytes():
+    """Пиковая резидентная память процесса и его дочерних процессов"""
+    # ru_maxrss в Linux указывается в килобайтах
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return {"self": own, "children": children}
+
+
+def cpu_seconds():
+    """Процессорное время процесса вместе с завершенными дочерними"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime)
+
+
+def environment(settings):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": platform.machine(),
+        "node": platform.node(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "settings": settings,
+    }
+
+
+def bench_tts(args):
+    """Синтез корпуса тем же путем, что и synthesize_text в TTS-сервере"""
+    os.environ["TTS_VOICES_DIR"] = args.voices_dir
+    if not args.cache:
+        # Иначе повторяющиеся фразы корпуса измеряли бы кэш, а не Piper
+        os.environ["TTS_CACHE_MAX_BYTES"] = "0"
+        os.environ.pop("TTS_CACHE_DIR", None)
+        os.environ["TTS_PHONEME_MEMO"] = "0"
+
+    # Сервер читает конфигурацию голоса относительно рабочего каталога
+    os.chdir(args.voices_dir)
+    sys.path.insert(0, str(TTS_SERVER_DIR))
+    import tts_server_pcm as server
+
+    voice_name = args.voice or server.DEFAULT_VOICE
+    if voice_name not in server.voice_pool:
+        print(f"Неизвестный голос: {voice_name}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.parallel > 0:
+        from parallel_synth import ParallelSynthesizer
+        server.parallel_synth = ParallelSynthesizer(args.parallel)
+
+    # Загрузка модели измеряется отдельно от синтеза
+    load_start = time.monotonic()
+    server.voice_pool.get(voice_name)
+    load_seconds = time.monotonic() - load_start
+
+    rate = server.voice_pool.sample_rate(voice_name)
+    texts = [(path, path.read_text(encoding="utf-8").strip())
+             for path in collect_files(args.texts, ".txt")]
+
+    results = []
+    all_chunk_latencies = []
+    total_audio = total_wall = 0.0
+    cpu_start = cpu_seconds()
+
+    for _ in range(args.repeat):
+        for path, text in texts:
+            chunk_latencies = []
+            samples = 0
+            first_audio = None
+            start = last = time.perf_counter()
+
+            # Первый фрагмент - пауза в начале, он не считается звуком
+            for index, chunk in enumerate(server.synthesize_stream(text, voice_name)):
+                now = time.perf_counter()
+                samples += len(chunk)
+                if index > 0:
+                    chunk_latencies.append(now - last)
+                    if first_audio is None:
+                        first_audio = now - start
+                last = now
+
+            wall = time.perf_counter() - start
+            audio = samples / rate
+            total_audio += audio
+            total_wall += wall
+            all_chunk_latencies.extend(chunk_latencies)
+
+            results.append({
+                "file": str(path),
+                "chars": len(text),
+                "audio_seconds": round(audio, 3),
+                "wall_seconds": round(wall, 3),
+                "rtf": round(wall / audio, 4) if audio else None,
+                "time_to_first_audio_ms": round(first_audio * 1000, 2) if first_audio is not None else None,
+                "chunks": len(chunk_latencies),
+                "chunk_latency_ms": percentiles(chunk_latencies),
+            })
+
+    # RUSAGE_CHILDREN учитывает только завершенные процессы: ждем воркеров
+    if server.parallel_synth is not None:
+        server.parallel_synth.shutdown(wait=True)
+
+    return {
+        "kind": "tts",
+        "environment": environment({
+            "voice": voice_name,
+            "sample_rate": rate,
+            "parallel_workers": args.parallel,
+            "cache": args.cache,
+            "repeat": args.repeat,
+        }),
+        "voice_load_seconds": round(load_seconds, 3),
+        "summary": {
+            "audio_seconds": round(total_audio, 3),
+            "wall_seconds": round(total_wall, 3),
+            "rtf": round(total_wall / total_audio, 4) if total_audio else None,
+            "cpu_seconds": round(cpu_seconds() - cpu_start, 3),
+            "chunk_latency_ms": percentiles(all_chunk_latencies),
+            "peak_rss_bytes": peak_rss_bytes(),
+        },
+        "files": results,
+    }
+
+
+def bench_asr(args):
+    """Распознавание WAV-файлов так же, как recognizer.py распознает микрофон"""
+    from vosk import Model, KaldiRecognizer, SetLogLevel
+
+    SetLogLevel(-1)
+
+    load_start = time.monotonic()
+    model = Model(args.model)
+    load_seconds = time.monotonic() - load_start
+
+    results = []
+    all_chunk_latencies = []
+    total_audio = total_wall = 0.0
+    cpu_start = cpu_seconds()
+
+    for _ in range(args.repeat):
+        for path in collect_files(args.wavs, ".wav"):
+            with wave.open(str(path), "rb") as wf:
+                if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
+                    print(f"Пропуск {path}: нужен моно WAV 16 бит", file=sys.stderr)
+                    continue
+                rate = wf.getframerate()
+                frames = wf.getnframes()
+                # Файл читается заранее, чтобы мерить только декодер
+                blocks = []
+                while True:
+                    data = wf.readframes(args.block_size)
+                    if not data:
+                        break
+                    blocks.append(data)
+
+            rec = KaldiRecognizer(model, rate)
+            chunk_latencies = []
+            first_partial = None
+            first_partial_audio = None
+            fed_samples = 0
+            texts = []
+            start = time.perf_counter()
+
+            for data in blocks:
+                block_start = time.perf_counter()
+                fed_samples += len(data) // 2
+                if rec.AcceptWaveform(data):
+                    text = json.loads(rec.Result()).get("text", "")
+                    if text:
+                        texts.append(text)
+                else:
+                    partial = json.loads(rec.PartialResult()).get("partial", "")
+                    if partial and first_partial is None:
+                        first_partial = time.perf_counter() - start
+                        first_partial_audio = fed_samples / rate
+                chunk_latencies.append(time.perf_counter() - block_start)
+
+            text = json.loads(rec.FinalResult()).get("text", "")
+            if text:
+                texts.append(text)
+
+            wall = time.perf_counter() - start
+            audio = frames / rate
+            total_audio += audio
+            total_wall += wall
+            all_chunk_latencies.extend(chunk_latencies)
+
+            results.append({
+                "file": str(path),
+                "audio_seconds": round(audio, 3),
+                "wall_seconds": round(wall, 3),
+                "rtf": round(wall / audio, 4) if audio else None,
+                "first_partial_ms": round(first_partial * 1000, 2) if first_partial else None,
+                "first_partial_audio_seconds": first_partial_audio,
+                "chunk_latency_ms": percentiles(chunk_latencies),
+                "text": " ".join(texts),
+            })
+
+    return {
+        "kind": "asr",
+        "environment": environment({
+            "model": args.model,
+            "block_size": args.block_size,
+            "repeat": args.repeat,
+        }),
+        "model_load_seconds": round(load_seconds, 3),
+        "summary": {
+            "audio_seconds": round(total_audio, 3),
+            "wall_seconds": round(total_wall, 3),
+            "rtf": round(total_wall / total_audio, 4) if total_audio else None,
+            "cpu_seconds": round(cpu_seconds() - cpu_start, 3),
+            "chunk_latency_ms": percentiles(all_chunk_latencies),
+            "peak_rss_bytes": peak_rss_bytes(),
+        },
+        "files": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк TTS (Piper) и ASR (Vosk)")
+    parser.add_argument("--output", help="файл для JSON-результата (по умолчанию stdout)")
+    parser.add_argument("--repeat", type=int, default=1, help="сколько раз прогнать корпус")
+    sub = parser.add_subparsers(dest="kind", required=True)
+
+    tts = sub.add_parser("tts", help="синтез речи")
+    tts.add_argument("texts", nargs="+", help="текстовые файлы или каталоги с *.txt")
+    tts.add_argument("--voices-dir", default=".", help="каталог с голосами *.onnx")
+    tts.add_argument("--voice", help="имя голоса (по умолчанию голос сервера)")
+    tts.add_argument("--parallel", type=int, default=0, help="число процессов параллельного синтеза")
+    tts.add_argument("--cache", action="store_true", help="не отключать кэш фраз и кэш фонем")
+
+    asr = sub.add_parser("asr", help="распознавание речи")
+    asr.add_argument("wavs", nargs="+", help="WAV-файлы или каталоги с *.wav")
+    asr.add_argument("--model", default="model", help="папка модели Vosk")
+    asr.add_argument("--block-size", type=int, default=ASR_BLOCK_SIZE, help="сэмплов в блоке")
+
+    args = parser.parse_args()
+    # Пути до смены рабочего каталога в бенчмарке TTS
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    if args.kind == "tts":
+        args.texts = [os.path.abspath(p) for p in args.texts]
+        args.voices_dir = os.path.abspath(args.voices_dir)
+
+    # Сообщения сервера и моделей не должны смешиваться с JSON в stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        report = bench_tts(args) if args.kind == "tts" else bench_asr(args)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+        print(f"Результат сохранен: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Полудуплекс: распознаватель не слушает, пока говорит сервер синтеза.
+
+PlaybackGate читает поток событий /events сервера TTS (SSE) и знает, звучит
+ли сейчас синтезированная речь. Пока она звучит и еще tail секунд после
+конца (хвост в динамике и эхо комнаты), распознаватель пропускает блоки.
+
+В режиме barge-in декодирование не останавливается: результаты, полученные
+во время речи сервера, помечаются, и распознанная команда прерывает
+воспроизведение через POST /stop.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import urllib.request
+
+TTS_SERVER = os.environ.get("TTS_SERVER", "http://192.168.0.18:8000")
+DUPLEX_MODE = os.environ.get("ASR_DUPLEX", "off")  # off, gate или barge-in
+DUPLEX_TAIL = float(os.environ.get("ASR_DUPLEX_TAIL", 0.5))
+
+RECONNECT_SECONDS = 2.0
+READ_TIMEOUT = 30.0  # Сервер шлет комментарий раз в 15 с
+
+
+class PlaybackGate:
+    """Состояние воспроизведения сервера TTS по его событиям"""
+    def __init__(self, server=TTS_SERVER, tail=DUPLEX_TAIL, barge_in=False):
+        self.server = server.rstrip("/")
+        self.tail = tail
+        self.barge_in = barge_in
+        self.speaking = False
+        self.muted_until = 0.0  # time.monotonic() конца хвоста
+        self.connected = False
+        self.lock = threading.Lock()
+
+        # Счетчики
+        self.utterances = 0
+        self.stops_sent = 0
+        self.stops_failed = 0
+
+        # /stop отправляет свой поток: декодер не ждет ответа сервера
+        self.stop_requested = threading.Event()
+
+        threading.Thread(target=self._listen, daemon=True).start()
+        threading.Thread(target=self._send_stops, daemon=True).start()
+
+    def is_muted(self) -> bool:
+        """Звучит речь сервера или ее хвост"""
+        with self.lock:
+            return self.speaking or time.monotonic() < self.muted_until
+
+    def _on_event(self, event: dict):
+        with self.lock:
+            if event["type"] == "state":
+                self.speaking = event.get("speaking", False)
+            elif event["type"] == "playback_start":
+                self.speaking = True
+                self.utterances += 1
+            elif event["type"] == "playback_end":
+                self.speaking = False
+                self.muted_until = time.monotonic() + self.tail
+
+    def _listen(self):
+        """Чтение SSE с переподключением; без связи распознаватель не глушится"""
+        while True:
+            try:
+                with urllib.request.urlopen(f"{self.server}/events", timeout=READ_TIMEOUT) as response:
+                    self.connected = True
+                    for line in response:
+                        line = line.decode("utf-8").strip()
+                        if line.startswith("data:"):
+                            self._on_event(json.loads(line[5:]))
+            except (OSError, ValueError) as e:
+                if self.connected:
+                    print(f"\nНет связи с сервером TTS: {e}", file=sys.stderr)
+            with self.lock:
+                self.connected = False
+                self.speaking = False
+            time.sleep(RECONNECT_SECONDS)
+
+    def stop_playback(self):
+        """Перебивание: сервер прерывает текущее высказывание (не блокирует)
+
+        Запросы, пришедшие до отправки предыдущего, склеиваются в один.
+        """
+        self.stop_requested.set()
+
+    def _send_stops(self):
+        while True:
+            self.stop_requested.wait()
+            self.stop_requested.clear()
+            request = urllib.request.Request(
+                f"{self.server}/stop", data=b"{}", method="POST",
+                headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=2.0):
+                    pass
+            except OSError as e:
+                self.stops_failed += 1
+                print(f"\nНе удалось прервать речь сервера: {e}", file=sys.stderr)
+                continue
+            self.stops_sent += 1
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "speaking": self.speaking,
+            "utterances": self.utterances,
+            "stops_sent": self.stops_sent,
+            "stops_failed": self.stops_failed,
+        }
+
+
+def make_gate():
+    """Полудуплекс по настройке ASR_DUPLEX; None, если выключен"""
+    if DUPLEX_MODE == "off":
+        return None
+    if DUPLEX_MODE not in ("gate", "barge-in"):
+        raise ValueError(f"Неизвестный режим ASR_DUPLEX: {DUPLEX_MODE}")
+    return PlaybackGate(barge_in=DUPLEX_MODE == "barge-in")
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import wave
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from vosk import Model, KaldiRecognizer, SetLogLevel
+
+# Настройки
+MODEL_PATH = "model"
+CHUNK_SECONDS = 4  # Сколько секунд звука читать из файла за раз
+
+# Модель загружается в каждом процессе пула один раз
+model = None
+
+def init_worker(model_path):
+    """Инициализация процесса пула"""
+    global model
+    SetLogLevel(-1)
+    model = Model(model_path)
+
+def transcribe(path, chunk_seconds):
+    """Распознавание одного WAV-файла с временем слов"""
+    started = time.monotonic()
+    try:
+        with wave.open(path, "rb") as wf:
+            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
+                return {"file": path, "error": "нужен моно WAV PCM 16 бит"}
+
+            rate = wf.getframerate()
+            if rate <= 0:
+                return {"file": path, "error": "неверная частота дискретизации"}
+            duration = wf.getnframes() / rate
+            chunk_frames = int(rate * chunk_seconds)
+
+            rec = KaldiRecognizer(model, rate)
+            rec.SetWords(True)
+
+            segments = []
+            while True:
+                data = wf.readframes(chunk_frames)
+                if not data:
+                    break
+                if rec.AcceptWaveform(data):
+                    segments.append(json.loads(rec.Result()))
+            segments.append(json.loads(rec.FinalResult()))
+
+    except Exception as e:
+        # Любая ошибка файла (WAV, Kaldi, JSON) - запись об ошибке, а не конец пакета
+        return {"file": path, "error": str(e) or type(e).__name__}
+
+    segments = [seg for seg in segments if seg.get("text")]
+    elapsed = time.monotonic() - started
+
+    return {
+        "file": path,
+        "duration": round(duration, 3),
+        "text": " ".join(seg["text"] for seg in segments),
+        "words": [word for seg in segments for word in seg.get("result", [])],
+        "elapsed": round(elapsed, 3),
+        "rtf": round(elapsed / duration, 4) if duration else None,
+    }
+
+def collect_inputs(paths, list_file):
+    """WAV-файлы из аргументов, каталогов (рекурсивно) и файла-списка"""
+    files = []
+    for p in paths:
+        path = Path(p)
+        if path.is_dir():
+            files.extend(str(f) for f in sorted(path.rglob("*.wav")))
+        else:
+            files.append(str(path))
+
+    if list_file:
+        with open(list_file, encoding="utf-8") as f:
+            files.extend(line.strip() for line in f if line.strip())
+
+    return files
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное распознавание WAV-файлов")
+    parser.add_argument("inputs", nargs="*", help="WAV-файлы или каталоги")
+    parser.add_argument("--list", help="файл со списком WAV-файлов, по одному на строку")
+    parser.add_argument("--model", default=MODEL_PATH, help="папка модели Vosk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="число процессов (каждый держит свою копию модели)")
+    parser.add_argument("--chunk-seconds", type=float, default=CHUNK_SECONDS,
+                        help="сколько секунд звука подавать за раз")
+    parser.add_argument("--output", help="файл JSON Lines (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"Ошибка: Папка '{args.model}' не найдена.")
+        exit(1)
+
+    files = collect_inputs(args.inputs, args.list)
+    if not files:
+        print("Нет файлов для распознавания.")
+        exit(1)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+
+    print(f"Файлов: {len(files)}, процессов: {args.workers}", file=sys.stderr)
+
+    started = time.monotonic()
+    done = 0
+    errors = 0
+    audio_seconds = 0.0
+
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(args.model,)) as pool:
+            futures = {pool.submit(transcribe, f, args.chunk_seconds): f for f in files}
+
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Например, процесс пула упал (BrokenProcessPool)
+                    result = {"file": futures[future], "error": str(e) or type(e).__name__}
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+                done += 1
+                if "error" in result:
+                    errors += 1
+                    print(f"\r\033[KОшибка: {result['file']}: {result['error']}", file=sys.stderr)
+                else:
+                    audio_seconds += result["duration"]
+
+                # Прогресс и пропускная способность в одной строке
+                elapsed = time.monotonic() - started
+                speed = audio_seconds / elapsed if elapsed else 0.0
+                sys.stderr.write(f"\r[{done}/{len(files)}] звук: {audio_seconds:.1f} с, "
+                                 f"скорость: {speed:.2f}x реального времени\033[K")
+                sys.stderr.flush()
+
+    except KeyboardInterrupt:
+        print("\n\nПрограмма остановлена пользователем.", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.monotonic() - started
+    print(f"\nГотово: {done - errors} файлов, ошибок: {errors}, "
+          f"{audio_seconds:.1f} с звука за {elapsed:.1f} с", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
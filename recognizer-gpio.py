@@ -1,18 +1,31 @@
 # -*- coding: utf-8 -*-
 
 import os
-import queue
 import sys
 import json
-import sounddevice as sd
-from vosk import Model, KaldiRecognizer
+from vosk import Model
+from vad import EnergyDetector, VADGate
+from audio_capture import CaptureEngine
+from asr_engine import RecognitionEngine
+from duplex import make_gate
+import audio_io
 import RepkaPi.GPIO as GPIO 
-from time import sleep
+from time import sleep, monotonic
 
 # --- Настройки ---
 MODEL_PATH = "model"
 SAMPLE_RATE = 16000
 LED_PIN = 7  # Пин светодиода (Board numbering)
+VAD_ENABLED = True  # Не отдавать распознавателю блоки без речи
+# 250 мс: устойчивый промежуточный результат приходит быстрее
+BLOCK_SIZE = int(os.environ.get("ASR_BLOCK_SIZE", 4000))
+CAPTURE_BUFFER_SECONDS = 5.0  # Больше этого звука при отставании не копится
+OVERFLOW_POLICY = os.environ.get("ASR_OVERFLOW_POLICY", "drop-oldest")
+
+# --- Режим команд ---
+COMMAND_MODE = True  # Распознавать только фразы из таблицы команд (грамматика Vosk)
+STABLE_PARTIALS = 2  # Сколько промежуточных результатов подряд должны совпасть
+DEBOUNCE_S = 1.5  # Повтор той же команды раньше этого времени игнорируется
 
 # --- Настройка GPIO ---
 GPIO.setmode(GPIO.BOARD)
@@ -20,21 +33,114 @@ GPIO.setup(LED_PIN, GPIO.OUT)
 # Изначально светодиод выключен
 GPIO.output(LED_PIN, GPIO.LOW)
 
-audio_queue = queue.Queue()
+# --- Таблица команд: фразы -> действие на GPIO ---
+COMMANDS = [
+    {"name": "light_on", "phrases": ["лампа"], "title": "ВКЛЮЧИТЬ СВЕТ",
+     "pin": LED_PIN, "level": GPIO.HIGH},
+    {"name": "light_off", "phrases": ["погасить"], "title": "ВЫКЛЮЧИТЬ СВЕТ",
+     "pin": LED_PIN, "level": GPIO.LOW},
+]
+
+# Индекс: кортеж слов фразы -> команда
+COMMAND_INDEX = {tuple(phrase.split()): cmd for cmd in COMMANDS for phrase in cmd["phrases"]}
+MAX_PHRASE_WORDS = max(len(words) for words in COMMAND_INDEX)
 
-def callback(indata, frames, time, status):
-    if status:
-        print(f"Ошибка захвата: {status}", file=sys.stderr)
-    audio_queue.put(bytes(indata))
+# Время последнего срабатывания каждой команды (для антидребезга)
+last_fired = {}
+
+# Команда из промежуточного результата и сколько раз подряд она встретилась
+partial_cmd = None
+partial_hits = 0
 
 def find_usb_microphone():
-    devices = sd.query_devices()
-    for i, dev in enumerate(devices):
-        if 'USB' in dev['name'] and dev['max_input_channels'] > 0:
-            print(f" Найдено устройство: {dev['name']} (ID: {i})")
-            return i
+    """Поиск ID USB-микрофона (в симуляторе AUDIO_BACKEND=sim - вход из WAV-файлов)"""
+    return audio_io.find_input_device("USB")
+
+def build_grammar():
+    """Грамматика Vosk из таблицы команд; [unk] поглощает посторонние слова"""
+    phrases = [phrase for cmd in COMMANDS for phrase in cmd["phrases"]]
+    return json.dumps(phrases + ["[unk]"], ensure_ascii=False)
+
+def match_command(text):
+    """Поиск команды в тексте по индексу фраз (первая слева)"""
+    words = text.split()
+    for i in range(len(words)):
+        for n in range(min(MAX_PHRASE_WORDS, len(words) - i), 0, -1):
+            cmd = COMMAND_INDEX.get(tuple(words[i:i + n]))
+            if cmd is not None:
+                return cmd
     return None
 
+def execute(cmd, during_playback=False):
+    """Исполнение команды с антидребезгом; True, если команда сработала
+
+    Команда, услышанная во время речи сервера TTS (barge-in), прерывает ее.
+    """
+    now = monotonic()
+    if now - last_fired.get(cmd["name"], float("-inf")) < DEBOUNCE_S:
+        return False
+    last_fired[cmd["name"]] = now
+    
+    sys.stdout.write("\r\033[K")
+    if during_playback and gate is not None:
+        print(">>> Перебивание: останавливаю речь сервера")
+        gate.stop_playback()
+    print(f">>> Исполняю: {cmd['title']}")
+    GPIO.output(cmd["pin"], cmd["level"])
+    return True
+
+def handle_result(event):
+    """Финальный результат: вывод и исполнение команд"""
+    global partial_cmd, partial_hits
+    partial_cmd, partial_hits = None, 0
+    
+    # Очищаем строку перед выводом результата
+    sys.stdout.write("\r\033[K")
+    
+    text = event.text.lower() # Переводим в нижний регистр для надежности
+    cmd = match_command(text)
+    
+    # Во время речи сервера значат только команды: остальное - скорее всего его голос
+    if event.during_playback and cmd is None:
+        return
+    print(f"Результат: {text}")
+    
+    if cmd is not None:
+        execute(cmd, event.during_playback)
+
+def handle_partial(event):
+    """Промежуточный результат: вывод и команда по устойчивому тексту"""
+    global partial_cmd, partial_hits
+    
+    sys.stdout.write(f"\r Слушаю: {event.text}...\033[K")
+    sys.stdout.flush()
+    
+    if not COMMAND_MODE:
+        return
+    
+    # Команда срабатывает по устойчивому промежуточному результату,
+    # не дожидаясь конца фразы. Движок повторяет неизменившийся текст
+    # один раз (stable_after), и это засчитывается как второе совпадение
+    cmd = match_command(event.text.lower())
+    if cmd is None:
+        partial_cmd, partial_hits = None, 0
+    elif cmd is partial_cmd:
+        partial_hits += 1
+    else:
+        partial_cmd, partial_hits = cmd, 1
+    
+    if cmd is not None and partial_hits >= STABLE_PARTIALS:
+        execute(cmd, event.during_playback)
+        # Сбрасываем фразу, чтобы финальный результат не повторил команду
+        engine.reset()
+        partial_cmd, partial_hits = None, 0
+
+def handle_event(event):
+    if event.type == "final":
+        handle_result(event)
+    else:
+        handle_partial(event)
+
 def set_terminal_no_wrap(enable=True):
     """Устраняет дублирование строк на консоли Repka Pi"""
     if enable:
@@ -49,7 +155,14 @@ if not os.path.exists(MODEL_PATH):
     exit(1)
 
 model = Model(MODEL_PATH)
-rec = KaldiRecognizer(model, SAMPLE_RATE)
+vad = VADGate(EnergyDetector(SAMPLE_RATE)) if VAD_ENABLED else None
+# Полудуплекс с сервером TTS (ASR_DUPLEX=gate или barge-in)
+gate = make_gate()
+# Декодирование по малой грамматике дешевле полного словаря; промежуточный
+# результат проверяется на каждом блоке, чтобы команды срабатывали без задержки
+engine = RecognitionEngine(model, SAMPLE_RATE, build_grammar() if COMMAND_MODE else None, vad,
+                           partial_interval=0, stable_after=STABLE_PARTIALS, gate=gate)
+engine.subscribe(handle_event)
 
 device_id = find_usb_microphone()
 if device_id is None:
@@ -57,44 +170,19 @@ if device_id is None:
     GPIO.cleanup()
     exit(1)
 
+capture = CaptureEngine(SAMPLE_RATE, BLOCK_SIZE, device_id,
+                        CAPTURE_BUFFER_SECONDS, OVERFLOW_POLICY)
+
 print("-" * 30)
 print("Система готова.")
-print("Команды: 'лампа' - включить, 'погасить' - выключить.")
+print("Команды: " + ", ".join(f"'{cmd['phrases'][0]}' - {cmd['title'].lower()}" for cmd in COMMANDS))
 print("-" * 30)
 
 try:
     set_terminal_no_wrap(True)
 
-    with sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=8000, device=device_id,
-                            dtype='int16', channels=1, callback=callback):
-        
-        while True:
-            data = audio_queue.get()
-            if rec.AcceptWaveform(data):
-                # Очищаем строку перед выводом результата
-                sys.stdout.write("\r\033[K")
-                
-                result_json = json.loads(rec.Result())
-                text = result_json.get("text", "").lower() # Переводим в нижний регистр для надежности
-                
-                if text:
-                    print(f"Результат: {text}")
-                    
-                    # --- Логика управления командами ---
-                    if "лампа" in text:
-                        print(">>> Исполняю: ВКЛЮЧИТЬ СВЕТ")
-                        GPIO.output(LED_PIN, GPIO.HIGH)
-                    
-                    elif "погасить" in text:
-                        print(">>> Исполняю: ВЫКЛЮЧИТЬ СВЕТ")
-                        GPIO.output(LED_PIN, GPIO.LOW)
-            else:
-                # Промежуточный результат (динамическое отображение)
-                partial = json.loads(rec.PartialResult())
-                partial_text = partial.get("partial", "")
-                if partial_text:
-                    sys.stdout.write(f"\r Слушаю: {partial_text}...\033[K")
-                    sys.stdout.flush()
+    with capture.open():
+        engine.run(capture)
 
 except KeyboardInterrupt:
     print("\nОстановка программы...")
@@ -102,4 +190,7 @@ finally:
     set_terminal_no_wrap(False)
     GPIO.output(LED_PIN, GPIO.LOW)
     GPIO.cleanup()
+    if vad is not None:
+        print(f"Отсечено тишины: {vad.gated_fraction:.0%}")
+    print(f"Захват: {capture.stats()}")
     print("Настройки сброшены. До свидания!")
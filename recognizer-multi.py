@@ -0,0 +1,226 @@
+"""Распознавание с нескольких микрофонов одной платы.
+
+Модель Vosk загружается один раз и общая для всех потоков; у каждого
+микрофона свой захват, VAD и KaldiRecognizer. Блоки декодирует небольшой
+пул рабочих потоков: один поток микрофона в каждый момент обрабатывается
+только одним рабочим, поэтому порядок блоков сохраняется.
+
+Микрофоны: ASR_DEVICES - список ID или частей имени через запятую,
+по умолчанию все устройства записи с "USB" в имени.
+"""
+import os
+import sys
+import json
+import time
+import threading
+from vosk import Model
+from vad import EnergyDetector, VADGate
+from audio_capture import CaptureEngine
+from asr_engine import RecognitionEngine
+import audio_io
+
+# Настройки
+MODEL_PATH = "model"
+SAMPLE_RATE = 16000
+VAD_ENABLED = True  # Не отдавать распознавателю блоки без речи
+
+DEVICES = os.environ.get("ASR_DEVICES", "")
+DEVICE_HINT = "USB"
+WORKERS = int(os.environ.get("ASR_WORKERS", 2))
+
+# Захват: размер блока и буфер на каждый микрофон
+BLOCK_SIZE = int(os.environ.get("ASR_BLOCK_SIZE", 8000))
+CAPTURE_BUFFER_SECONDS = 5.0
+OVERFLOW_POLICY = os.environ.get("ASR_OVERFLOW_POLICY", "drop-oldest")
+
+# Вывод: terminal - строки с именем микрофона, jsonl - JSON по строке на stdout
+OUTPUT_MODE = os.environ.get("ASR_OUTPUT", "terminal")
+STATS_INTERVAL = float(os.environ.get("ASR_STATS_INTERVAL", 60))  # 0 - только в конце
+IDLE_SLEEP = 0.01  # Пауза рабочего, когда ни у одного микрофона нет полного блока
+LATENCY_WINDOW = 1000  # Сколько последних задержек хранить на поток
+
+print_lock = threading.Lock()
+
+
+def select_devices():
+    """Микрофоны из ASR_DEVICES или все с DEVICE_HINT в имени: [(ID, имя)]"""
+    available = audio_io.list_input_devices()
+    if not DEVICES:
+        if audio_io.is_simulated():
+            return available
+        return [(i, name) for i, name in available if DEVICE_HINT in name]
+
+    selected = []
+    for item in (part.strip() for part in DEVICES.split(",")):
+        if not item:
+            continue
+        matches = [(i, name) for i, name in available
+                   if str(i) == item or item in name]
+        if not matches:
+            print(f"Устройство не найдено: {item}", file=sys.stderr)
+        selected += [m for m in matches if m not in selected]
+    return selected
+
+
+def percentile_ms(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000, 1)
+
+
+class MicStream:
+    """Один микрофон: захват, распознаватель и учет нагрузки"""
+    def __init__(self, device, name, model):
+        self.device = device
+        self.name = name
+        self.capture = CaptureEngine(SAMPLE_RATE, BLOCK_SIZE, device,
+                                     CAPTURE_BUFFER_SECONDS, OVERFLOW_POLICY)
+        self.vad = VADGate(EnergyDetector(SAMPLE_RATE)) if VAD_ENABLED else None
+        self.engine = RecognitionEngine(model, SAMPLE_RATE, vad=self.vad)
+        self.engine.subscribe(self.on_event)
+        self.busy = threading.Lock()  # Блоки одного микрофона - строго по очереди
+        self.finished = False
+
+        # Учет: процессорное время декодера, звук и задержка блока
+        # (от записи последнего сэмпла до конца его декодирования)
+        self.cpu_seconds = 0.0
+        self.blocks = 0
+        self.latencies = []
+
+    def on_event(self, event):
+        if OUTPUT_MODE == "jsonl":
+            line = json.dumps({"device": self.name, **event.to_dict()}, ensure_ascii=False)
+            with print_lock:
+                sys.stdout.write(line + "\n")
+                sys.stdout.flush()
+        elif event.type == "final":
+            with print_lock:
+                print(f"[{self.name}] {event.text}")
+
+    def step(self):
+        """Декодирование одного блока, если он есть; False - работы нет"""
+        if self.finished or not self.busy.acquire(blocking=False):
+            return False
+        try:
+            data = self.capture.read_block(timeout=0)
+            if data is None:
+                if self.capture.ring.closed:
+                    # Вход симулятора закончился
+                    self.engine.finish()
+                    self.finished = True
+                return False
+
+            # За блоком в кольце уже ждут depth сэмплов - столько он пролежал
+            waited = self.capture.ring.depth / SAMPLE_RATE
+            cpu_started = time.thread_time()
+            started = time.perf_counter()
+            self.engine.accept(data)
+            self.cpu_seconds += time.thread_time() - cpu_started
+            self.blocks += 1
+            self.latencies.append(waited + time.perf_counter() - started)
+            if len(self.latencies) > LATENCY_WINDOW:
+                del self.latencies[:len(self.latencies) - LATENCY_WINDOW]
+            return True
+        finally:
+            self.busy.release()
+
+    def stats(self):
+        audio_seconds = self.blocks * BLOCK_SIZE / SAMPLE_RATE
+        ring = self.capture.ring
+        return {
+            "device": self.name,
+            "audio_seconds": round(audio_seconds, 1),
+            "cpu_seconds": round(self.cpu_seconds, 2),
+            # Доля одного ядра, которую занимает этот микрофон
+            "cpu_load": round(self.cpu_seconds / audio_seconds, 3) if audio_seconds else None,
+            "latency_ms": {"p50": percentile_ms(self.latencies, 50),
+                           "p90": percentile_ms(self.latencies, 90),
+                           "max": percentile_ms(self.latencies, 100)},
+            "gated": round(self.vad.gated_fraction, 2) if self.vad is not None else None,
+            "overflows": ring.overflows,
+            "dropped_seconds": round(ring.dropped_samples / SAMPLE_RATE, 1),
+        }
+
+
+def worker(streams, offset, stop):
+    """Рабочий пула: обходит микрофоны по кругу, каждый со своего места"""
+    n = len(streams)
+    while not stop.is_set():
+        did_work = False
+        for k in range(n):
+            if streams[(offset + k) % n].step():
+                did_work = True
+        offset = (offset + 1) % n
+        if not did_work:
+            if all(stream.finished for stream in streams):
+                return
+            time.sleep(IDLE_SLEEP)
+
+
+def print_stats(streams):
+    """Нагрузка по микрофонам и оценка, сколько их потянет плата"""
+    with print_lock:
+        loads = []
+        for stream in streams:
+            stats = stream.stats()
+            print(f"Поток: {stats}", file=sys.stderr)
+            if stats["cpu_load"] is not None:
+                loads.append(stats["cpu_load"])
+        if loads:
+            total = sum(loads)
+            cores = os.cpu_count() or 1
+            estimate = int(cores * len(loads) / total) if total > 0 else None
+            print(f"Всего: {total:.2f} ядра на {len(loads)} микрофон(ов); "
+                  f"при {cores} ядрах - до {estimate} микрофонов", file=sys.stderr)
+
+
+def main():
+    if not os.path.exists(MODEL_PATH):
+        print(f"Ошибка: Папка '{MODEL_PATH}' не найдена.")
+        exit(1)
+
+    devices = select_devices()
+    if not devices:
+        print("Микрофоны не найдены.")
+        exit(1)
+
+    # Одна модель на все потоки
+    model = Model(MODEL_PATH)
+    streams = [MicStream(device, name, model) for device, name in devices]
+    workers = max(1, min(WORKERS, len(streams)))
+
+    print("-" * 30, file=sys.stderr)
+    for stream in streams:
+        print(f" Микрофон: {stream.name} (ID: {stream.device})", file=sys.stderr)
+    print(f"Рабочих потоков: {workers}. Говорите...", file=sys.stderr)
+    print("-" * 30, file=sys.stderr)
+
+    stop = threading.Event()
+    inputs = [stream.capture.open() for stream in streams]
+    try:
+        for audio_input in inputs:
+            audio_input.start()
+        threads = [threading.Thread(target=worker, args=(streams, i, stop), daemon=True)
+                   for i in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        last_stats = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.2)
+            if STATS_INTERVAL > 0 and time.monotonic() - last_stats >= STATS_INTERVAL:
+                last_stats = time.monotonic()
+                print_stats(streams)
+    except KeyboardInterrupt:
+        print("\n\nПрограмма остановлена пользователем.", file=sys.stderr)
+    finally:
+        stop.set()
+        for audio_input in inputs:
+            audio_input.stop()
+            audio_input.close()
+        print_stats(streams)
+
+
+if __name__ == "__main__":
+    main()
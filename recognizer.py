@@ -1,34 +1,51 @@
 import os
-import queue
 import sys
-import json
-import sounddevice as sd
-from vosk import Model, KaldiRecognizer
+from vosk import Model
+from vad import EnergyDetector, VADGate
+from audio_capture import CaptureEngine
+from asr_engine import RecognitionEngine, JsonLinesWriter, SocketPublisher
+from duplex import make_gate
+import audio_io
 
 # Настройки
 MODEL_PATH = "model"
 SAMPLE_RATE = 16000
+VAD_ENABLED = True  # Не отдавать распознавателю блоки без речи
 
-# Очередь для аудиоданных
-audio_queue = queue.Queue()
+# Захват: размер блока (задержка против нагрузки на процессор) и буфер
+BLOCK_SIZE = int(os.environ.get("ASR_BLOCK_SIZE", 8000))
+CAPTURE_BUFFER_SECONDS = 5.0  # Больше этого звука при отставании не копится
+OVERFLOW_POLICY = os.environ.get("ASR_OVERFLOW_POLICY", "drop-oldest")
 
-def callback(indata, frames, time, status):
-    """Функция обратного вызова для захвата аудио"""
-    if status:
-        print(f"Ошибка захвата: {status}", file=sys.stderr)
-    audio_queue.put(bytes(indata))
+# Вывод событий: terminal - строка в терминале, jsonl - JSON по строке на stdout;
+# ASR_EVENTS_SOCKET - дополнительно рассылать события на Unix-сокет
+OUTPUT_MODE = os.environ.get("ASR_OUTPUT", "terminal")
+EVENTS_SOCKET = os.environ.get("ASR_EVENTS_SOCKET") or None
 
 def find_usb_microphone():
-    """Поиск ID USB-микрофона"""
-    devices = sd.query_devices()
-    for i, dev in enumerate(devices):
-        if 'USB' in dev['name'] and dev['max_input_channels'] > 0:
-            print(f" Найдено устройство: {dev['name']} (ID: {i})")
-            return i
-    return None
+    """Поиск ID USB-микрофона (в симуляторе AUDIO_BACKEND=sim - вход из WAV-файлов)"""
+    return audio_io.find_input_device("USB")
+
+def print_event(event):
+    """Вывод события распознавания в терминал"""
+    if event.type == "partial":
+        # \r возвращает в начало, текст пишется поверх старого,
+        # \033[K убирает лишние символы справа, если новая фраза короче старой
+        sys.stdout.write(f"\r {event.text}...\033[K")
+    else:
+        # Печатаем результат и переходим на новую строку;
+        # в симуляторе - с задержкой от записи звука до результата
+        latency = capture.read_latency()
+        suffix = f" ({latency * 1000:.0f} мс)" if latency is not None else ""
+        if event.during_playback:
+            suffix += " [во время речи сервера]"
+        sys.stdout.write(f"\r\033[KРезультат: {event.text}{suffix}\n")
+    sys.stdout.flush()
 
 def set_terminal_no_wrap(enable=True):
     """Отключает или включает автоматический перенос строк в терминале"""
+    if not terminal:
+        return
     if enable:
         sys.stdout.write("\033[?7l")  # Отключить перенос (DECAWM)
     else:
@@ -42,13 +59,28 @@ if not os.path.exists(MODEL_PATH):
 
 # Инициализация Vosk
 model = Model(MODEL_PATH)
-rec = KaldiRecognizer(model, SAMPLE_RATE)
+vad = VADGate(EnergyDetector(SAMPLE_RATE)) if VAD_ENABLED else None
+# Полудуплекс: ASR_DUPLEX=gate не слушает речь сервера TTS (TTS_SERVER),
+# barge-in слушает и помечает такие результаты
+gate = make_gate()
+engine = RecognitionEngine(model, SAMPLE_RATE, vad=vad, gate=gate)
+terminal = OUTPUT_MODE == "terminal"
+if terminal:
+    engine.subscribe(print_event)
+else:
+    # В stdout идут только события, все остальные сообщения - в stderr
+    engine.subscribe(JsonLinesWriter(sys.stdout))
+    sys.stdout = sys.stderr
+publisher = engine.subscribe(SocketPublisher(EVENTS_SOCKET)) if EVENTS_SOCKET else None
 
 device_id = find_usb_microphone()
 if device_id is None:
     print("USB-микрофон не найден.")
     exit(1)
 
+capture = CaptureEngine(SAMPLE_RATE, BLOCK_SIZE, device_id,
+                        CAPTURE_BUFFER_SECONDS, OVERFLOW_POLICY)
+
 print("-" * 30)
 print("Микрофон готов. Говорите...")
 print("-" * 30)
@@ -57,31 +89,8 @@ try:
     # Отключаем перенос строк, чтобы длинные фразы не плодили новые строки
     set_terminal_no_wrap(True)
 
-    with sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=8000, device=device_id,
-                            dtype='int16', channels=1, callback=callback):
-        
-        while True:
-            data = audio_queue.get()
-            if rec.AcceptWaveform(data):
-                # Очищаем текущую строку перед выводом финального результата
-                # \r - в начало, \033[K - очистить до конца строки
-                sys.stdout.write("\r\033[K")
-                
-                result = json.loads(rec.Result())
-                text = result.get("text", "")
-                if text:
-                    # Печатаем результат и переходим на новую строку
-                    sys.stdout.write(f"Результат: {text}\n")
-                    sys.stdout.flush()
-            else:
-                # Промежуточный результат
-                partial = json.loads(rec.PartialResult())
-                partial_text = partial.get("partial", "")
-                if partial_text:
-                    # \r возвращает в начало, текст пишется поверх старого, 
-                    # \033[K убирает лишние символы справа, если новая фраза короче старой
-                    sys.stdout.write(f"\r {partial_text}...\033[K")
-                    sys.stdout.flush()
+    with capture.open():
+        engine.run(capture)
 
 except KeyboardInterrupt:
     # Возвращаем терминал в нормальное состояние
@@ -92,4 +101,14 @@ except Exception as e:
     print(f"\nПроизошла ошибка: {e}")
 finally:
     # На всякий случай включаем перенос обратно
-    set_terminal_no_wrap(False)
\ No newline at end of file
+    set_terminal_no_wrap(False)
+    if vad is not None:
+        print(f"Отсечено тишины: {vad.gated_fraction:.0%}")
+    print(f"Захват: {capture.stats()}")
+    print(f"События: {engine.stats()}")
+    if gate is not None:
+        print(f"Полудуплекс: {gate.stats()}")
+    if publisher is not None:
+        publisher.close()
+    if audio_io.is_simulated():
+        print(f"Симулятор: {audio_io.sim_report()}")
\ No newline at end of file
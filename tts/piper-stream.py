@@ -1,15 +1,14 @@
 #!/usr/bin/env python3
-import subprocess
-import sounddevice as sd
+import audio_io
 import sys
 from pathlib import Path
+from piper_client import PiperStream
 
 PIPER_BIN = "piper"
 MODEL = "/root/piper-voices/ru/ru_RU-irina-medium.onnx"
 
 SAMPLE_RATE = 22050
-CHANNELS = 1
-DTYPE = "int16"
+DEVICE = "pulse"
 
 BLOCKSIZE = 2048
 BYTES_PER_SAMPLE = 2
@@ -24,36 +23,17 @@ def speak_from_file(text_path: Path):
         print("❌ Файл пустой", file=sys.stderr)
         sys.exit(1)
 
-    sd.default.device = "pulse"
-    sd.default.samplerate = SAMPLE_RATE
-    sd.default.channels = CHANNELS
-
-    proc = subprocess.Popen(
-        [
-            PIPER_BIN,
-            "--model", MODEL,
-            "--output_raw"
-        ],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL
-    )
-
-    proc.stdin.write(text.encode("utf-8"))
-    proc.stdin.close()
-
-    with sd.RawOutputStream(
-        samplerate=SAMPLE_RATE,
-        channels=CHANNELS,
-        dtype=DTYPE,
-        blocksize=BLOCKSIZE,
-        latency="high" 
-    ) as stream:
+    # Демон piper_daemon.py отдает звук без загрузки модели;
+    # если он не запущен, стартует отдельный процесс piper
+    source = PiperStream(text, MODEL, PIPER_BIN)
+
+    # AUDIO_BACKEND=sim - без динамика, звук собирается в буфер симулятора
+    with source, audio_io.open_output(SAMPLE_RATE, BLOCKSIZE, device=DEVICE) as stream:
 
         stream.start()
 
         while True:
-            data = proc.stdout.read(BLOCKSIZE * BYTES_PER_SAMPLE * 2)
+            data = source.read(BLOCKSIZE * BYTES_PER_SAMPLE * 2)
             if not data:
                 break
 
@@ -63,8 +43,6 @@ def speak_from_file(text_path: Path):
 
             stream.write(data)
 
-    proc.wait()
-
 
 def main():
     if len(sys.argv) != 2:
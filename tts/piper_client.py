@@ -0,0 +1,88 @@
+"""Источник PCM для скриптов: демон Piper, а если его нет - новый процесс piper."""
+import os
+import sys
+import json
+import socket
+import subprocess
+
+SOCKET_PATH = os.environ.get("PIPER_SOCKET", "/tmp/piper-daemon.sock")
+
+
+class PiperStream:
+    """Сырой PCM int16 синтезированного текста
+
+    read() и fileno() работают одинаково для обоих источников, поэтому
+    поток можно читать самому или отдать на stdin другому процессу (aplay).
+    """
+    def __init__(self, text: str, model: str, piper_bin: str = "piper",
+                 socket_path: str = SOCKET_PATH):
+        self.proc = None
+        self.sock = None
+        self.sample_rate = None
+
+        if not self._connect(text, model, socket_path):
+            self._spawn(text, model, piper_bin)
+
+    def _connect(self, text, model, socket_path) -> bool:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+            request = json.dumps({"model": model}) + "\n" + text
+            sock.sendall(request.encode("utf-8"))
+            sock.shutdown(socket.SHUT_WR)
+            status = self._read_status(sock)
+        except OSError:
+            sock.close()
+            return False
+
+        if not status.startswith("OK "):
+            print(f"Демон Piper: {status}", file=sys.stderr)
+            sock.close()
+            return False
+
+        self.sock = sock
+        self.sample_rate = int(status[3:])
+        self.source = "daemon"
+        self.file = sock.makefile("rb")
+        return True
+
+    @staticmethod
+    def _read_status(sock) -> str:
+        """Строка статуса по байту: все после нее - PCM для read() или fileno()"""
+        line = bytearray()
+        while True:
+            byte = sock.recv(1)
+            if not byte or byte == b"\n":
+                return line.decode("utf-8", "replace")
+            line += byte
+
+    def _spawn(self, text, model, piper_bin):
+        self.proc = subprocess.Popen(
+            [piper_bin, "--model", model, "--output_raw"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self.proc.stdin.write(text.encode("utf-8"))
+        self.proc.stdin.close()
+        self.source = "spawn"
+        self.file = self.proc.stdout
+
+    def read(self, n: int) -> bytes:
+        return self.file.read(n)
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+        if self.sock is not None:
+            self.sock.close()
+        if self.proc is not None:
+            self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Долгоживущий демон синтеза Piper на локальном Unix-сокете.
+
+Голос загружается один раз и остается в памяти, поэтому скрипты
+piper-stream.py и piper_stream_aplay.py получают первый звук за время
+синтеза, а не за время загрузки модели.
+
+Протокол: клиент отправляет строку JSON-заголовка {"model": "..."} и текст,
+затем закрывает свою сторону на запись. Демон отвечает строкой
+"OK <частота>" или "ERR <сообщение>", после чего идет сырой PCM int16 моно.
+"""
+import os
+import sys
+import json
+import socket
+import threading
+import socketserver
+
+from piper import PiperVoice
+
+from piper_client import SOCKET_PATH
+
+MODEL = "/root/piper-voices/ru/ru_RU-irina-medium.onnx"
+
+MAX_TEXT_BYTES = 1024 * 1024
+
+# Загруженные голоса: путь к модели -> PiperVoice
+voices = {}
+voices_lock = threading.Lock()
+# Запросы синтезируются по одному, чтобы не делить процессор между ними
+synth_lock = threading.Lock()
+
+
+def get_voice(model_path: str) -> PiperVoice:
+    with voices_lock:
+        voice = voices.get(model_path)
+        if voice is None:
+            voice = PiperVoice.load(model_path)
+            voices[model_path] = voice
+            print(f"Голос загружен: {model_path}", file=sys.stderr)
+        return voice
+
+
+class SynthesisHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            header = json.loads(self.rfile.readline(64 * 1024) or b"{}")
+            data = self.rfile.read(MAX_TEXT_BYTES + 1)
+            if len(data) > MAX_TEXT_BYTES:
+                # Дочитываем остаток, чтобы клиент получил ERR, а не обрыв
+                # на записи, и не синтезируем обрезанный текст
+                while self.rfile.read(64 * 1024):
+                    pass
+                raise ValueError(f"текст длиннее {MAX_TEXT_BYTES} байт")
+            text = data.decode("utf-8").strip()
+            voice = get_voice(header.get("model") or MODEL)
+        except Exception as e:
+            self.wfile.write(f"ERR {e}\n".encode("utf-8"))
+            return
+
+        self.wfile.write(f"OK {voice.config.sample_rate}\n".encode("ascii"))
+        if not text:
+            return
+
+        try:
+            with synth_lock:
+                for chunk in voice.synthesize(text):
+                    self.wfile.write(chunk.audio_int16_bytes)
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент ушел, не дослушав
+            pass
+
+
+class DaemonServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    model = sys.argv[1] if len(sys.argv) > 1 else MODEL
+
+    if os.path.exists(SOCKET_PATH):
+        # Сокет от предыдущего запуска, если на нем никто не слушает
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(SOCKET_PATH)
+            print(f"❌ Демон уже запущен: {SOCKET_PATH}", file=sys.stderr)
+            sys.exit(1)
+        except OSError:
+            os.unlink(SOCKET_PATH)
+        finally:
+            probe.close()
+
+    get_voice(model)
+
+    with DaemonServer(SOCKET_PATH, SynthesisHandler) as server:
+        print(f"Демон Piper слушает {SOCKET_PATH}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(SOCKET_PATH)
+
+
+if __name__ == "__main__":
+    main()
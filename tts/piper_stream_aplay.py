@@ -2,6 +2,7 @@
 import subprocess
 import sys
 from pathlib import Path
+from piper_client import PiperStream
 
 PIPER_BIN = "piper"
 MODEL_PATH = "/root/piper-voices/ru/ru_RU-irina-medium.onnx"
@@ -21,16 +22,9 @@ def speak_from_file(text_path: Path):
         print("❌ Файл пустой", file=sys.stderr)
         sys.exit(1)
 
-    piper = subprocess.Popen(
-        [
-            PIPER_BIN,
-            "--model", MODEL_PATH,
-            "--output_raw"
-        ],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.DEVNULL
-    )
+    # Демон piper_daemon.py отдает звук без загрузки модели;
+    # если он не запущен, стартует отдельный процесс piper
+    piper = PiperStream(text, MODEL_PATH, PIPER_BIN)
 
     aplay = subprocess.Popen(
         [
@@ -40,16 +34,12 @@ def speak_from_file(text_path: Path):
             "-t", "raw",
             "-D", DEVICE
         ],
-        stdin=piper.stdout,
+        stdin=piper,
         stderr=subprocess.DEVNULL
     )
 
-    # Передаём текст Piper
-    piper.stdin.write(text.encode("utf-8"))
-    piper.stdin.close()
-
     aplay.wait()
-    piper.wait()
+    piper.close()
 
 
 def main():
@@ -0,0 +1 @@
+../../audio_codecs.py
\ No newline at end of file
@@ -0,0 +1 @@
+../../audio_io.py
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""Быстрый движок синтеза на библиотеке espeak-ng (через ctypes, без процессов).
+
+Звук получается прямо в numpy-буферы из callback библиотеки. Качество
+ниже, чем у Piper, зато первый звук готов за миллисекунды - подходит
+для коротких и срочных сообщений.
+"""
+import ctypes
+import ctypes.util
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+# Константы из speak_lib.h
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+POS_CHARACTER = 1
+ESPEAK_CHARS_UTF8 = 1
+ESPEAK_RATE = 1
+ESPEAK_VOLUME = 2
+ESPEAK_PITCH = 3
+EE_OK = 0
+
+BUFFER_MS = 200  # Размер порции звука, которую библиотека отдает в callback
+
+SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short),
+                                  ctypes.c_int, ctypes.c_void_p)
+
+
+class EspeakEngine:
+    """espeak-ng внутри процесса сервера
+
+    Библиотека хранит состояние глобально, поэтому синтез идет под блокировкой.
+    Загрузка ленивая: если библиотеки нет, available() возвращает False.
+    """
+    def __init__(self, voice: str = "ru", rate: int = 160, pitch: int = 50,
+                 lib_path: Optional[str] = None):
+        self.voice = voice
+        self.rate = rate
+        self.pitch = pitch
+        self.lib_path = lib_path
+        self.lib = None
+        self.sample_rate = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.chunks = []
+        # Ссылка на callback должна жить, пока жива библиотека
+        self._callback = SYNTH_CALLBACK(self._on_audio)
+
+        # Счетчики
+        self.requests = 0
+        self.chars = 0
+        self.audio_seconds = 0.0
+        self.synth_seconds = 0.0
+        self.last_latency = None
+
+    def _load(self):
+        """Загрузка и инициализация библиотеки (вызывать под lock)"""
+        if self.lib is not None or self.error is not None:
+            return
+        try:
+            path = self.lib_path or ctypes.util.find_library("espeak-ng") or "libespeak-ng.so.1"
+            lib = ctypes.CDLL(path)
+            lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+            lib.espeak_SetSynthCallback.argtypes = [SYNTH_CALLBACK]
+            lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+            lib.espeak_SetParameter.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+            lib.espeak_Synth.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_uint, ctypes.c_uint,
+                                         ctypes.POINTER(ctypes.c_uint), ctypes.c_void_p]
+
+            sample_rate = lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, BUFFER_MS, None, 0)
+            if sample_rate <= 0:
+                raise RuntimeError("espeak_Initialize вернул ошибку")
+            lib.espeak_SetSynthCallback(self._callback)
+            if lib.espeak_SetVoiceByName(self.voice.encode("utf-8")) != EE_OK:
+                raise RuntimeError(f"голос не найден: {self.voice}")
+            lib.espeak_SetParameter(ESPEAK_RATE, self.rate, 0)
+            lib.espeak_SetParameter(ESPEAK_PITCH, self.pitch, 0)
+
+            self.lib = lib
+            self.sample_rate = sample_rate
+            print(f"espeak-ng загружен: голос {self.voice}, {sample_rate} Гц")
+        except (OSError, AttributeError, RuntimeError) as e:
+            self.error = str(e)
+            print(f"espeak-ng недоступен: {e}")
+
+    def available(self) -> bool:
+        with self.lock:
+            self._load()
+            return self.lib is not None
+
+    def _on_audio(self, wav, num_samples, events):
+        """Callback библиотеки: копия порции звука в список"""
+        if wav and num_samples > 0:
+            self.chunks.append(np.ctypeslib.as_array(wav, shape=(num_samples,)).copy())
+        return 0
+
+    def synthesize(self, text: str) -> np.ndarray:
+        """Синтез текста в int16 с частотой sample_rate"""
+        data = text.encode("utf-8") + b"\0"
+        with self.lock:
+            self._load()
+            if self.lib is None:
+                raise RuntimeError(f"espeak-ng недоступен: {self.error}")
+
+            self.chunks = []
+            started = time.perf_counter()
+            # В синхронном режиме вызов возвращается после синтеза всего текста
+            result = self.lib.espeak_Synth(data, len(data), 0, POS_CHARACTER, 0,
+                                           ESPEAK_CHARS_UTF8, None, None)
+            elapsed = time.perf_counter() - started
+            chunks, self.chunks = self.chunks, []
+
+        if result != EE_OK:
+            raise RuntimeError(f"espeak_Synth вернул {result}")
+
+        audio = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+        self.requests += 1
+        self.chars += len(text)
+        self.audio_seconds += len(audio) / self.sample_rate
+        self.synth_seconds += elapsed
+        self.last_latency = elapsed
+        return audio
+
+    def stats(self) -> dict:
+        return {
+            "available": self.lib is not None,
+            "error": self.error,
+            "voice": self.voice,
+            "sample_rate": self.sample_rate,
+            "requests": self.requests,
+            "chars": self.chars,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "synth_seconds": round(self.synth_seconds, 4),
+            "last_latency": round(self.last_latency, 4) if self.last_latency is not None else None,
+            "rtf": round(self.synth_seconds / self.audio_seconds, 4) if self.audio_seconds else None,
+        }
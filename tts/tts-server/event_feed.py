@@ -0,0 +1,85 @@
+"""Рассылка событий воспроизведения подписчикам (Server-Sent Events).
+
+События публикуются из любого потока, в том числе из callback аудиовыхода:
+publish() только ставит их в очереди подписчиков через цикл событий.
+Подписчик, который не успевает читать, теряет старые события, а не
+задерживает воспроизведение.
+"""
+import json
+import time
+import asyncio
+import threading
+
+SUBSCRIBER_QUEUE = 64  # Событий в очереди одного подписчика
+HEARTBEAT_SECONDS = 15.0  # Комментарий SSE, чтобы обрыв связи был заметен
+
+
+class EventFeed:
+    def __init__(self):
+        self.loop = None
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.published = 0
+        self.dropped = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Цикл событий сервера; до вызова публикация ничего не делает"""
+        self.loop = loop
+
+    def publish(self, event_type: str, **data):
+        """Событие всем подписчикам (потокобезопасно, не блокирует)"""
+        if self.loop is None:
+            return
+        with self.lock:
+            self.seq += 1
+            event = {"type": event_type, "id": self.seq, "time": time.time(), **data}
+            self.published += 1
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, event)
+        except RuntimeError:
+            # Цикл уже закрыт - сервер останавливается
+            pass
+
+    def _deliver(self, event: dict):
+        for queue in list(self.subscribers):
+            if queue.full():
+                # Старое событие выбрасываем: важнее последнее состояние
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+
+    async def sse(self, initial: dict):
+        """Поток SSE для StreamingResponse: начальное состояние, затем события"""
+        queue = self.subscribe()
+        try:
+            yield format_sse(initial)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+
+def format_sse(event: dict) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    return f"event: {event['type']}\ndata: {data}\n\n"
@@ -0,0 +1,105 @@
+import re
+import json
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Граница предложения: знак конца предложения и пробел после него
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+# Голоса, загруженные в процессе-воркере: путь к модели -> PiperVoice
+_worker_voices = {}
+
+
+def split_sentences(line: str) -> list:
+    """Разбиение строки на предложения для раздачи воркерам"""
+    return [part for part in SENTENCE_END.split(line) if part.strip()]
+
+
+def _load_voice(model_path: str, config_path: str):
+    """Загрузка голоса в воркере с одним потоком ONNX Runtime"""
+    import onnxruntime
+    from piper import PiperVoice
+    from piper.config import PiperConfig
+
+    with open(config_path, encoding="utf-8") as f:
+        config = PiperConfig.from_dict(json.load(f))
+
+    # Параллелизм дают процессы; внутренние потоки только мешали бы друг другу
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = 1
+    options.inter_op_num_threads = 1
+    session = onnxruntime.InferenceSession(
+        model_path, sess_options=options, providers=["CPUExecutionProvider"]
+    )
+    return PiperVoice(session=session, config=config)
+
+
+def _synthesize(model_path: str, config_path: str, text: str, syn_params: dict) -> np.ndarray:
+    """Синтез одного фрагмента текста в процессе-воркере"""
+    from piper import SynthesisConfig
+
+    voice = _worker_voices.get(model_path)
+    if voice is None:
+        voice = _load_voice(model_path, config_path)
+        _worker_voices[model_path] = voice
+
+    chunks = [chunk.audio_int16_array
+              for chunk in voice.synthesize(text, syn_config=SynthesisConfig(**syn_params))]
+    if not chunks:
+        return np.zeros(0, dtype=np.int16)
+    return np.concatenate(chunks)
+
+
+class ParallelSynthesizer:
+    """Пул процессов Piper для синтеза длинных текстов на всех ядрах"""
+    def __init__(self, workers: int):
+        self.workers = workers
+        # spawn: воркеры не наследуют аудиопоток и потоки сервера
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(self, model_path: str, config_path: str, text: str, syn_params: dict):
+        return self.executor.submit(_synthesize, model_path, config_path, text, syn_params)
+
+    def map_ordered(self, jobs, window: int = 0):
+        """Результаты строго по порядку заданий; вперед считается не больше window
+
+        jobs - итератор пар (готовый массив или None, аргументы для submit).
+        """
+        window = window or self.workers * 2
+        pending = deque()
+        jobs = iter(jobs)
+        exhausted = False
+
+        try:
+            while True:
+                # Держим воркеры занятыми, но не копим в памяти весь документ
+                while not exhausted and len(pending) < window:
+                    try:
+                        ready, args = next(jobs)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append(ready if ready is not None else self.submit(*args))
+
+                if not pending:
+                    return
+
+                head = pending.popleft()
+                # Голова последовательности отдается сразу, как только готова
+                yield head if isinstance(head, np.ndarray) else head.result()
+        finally:
+            # Потребитель закрыл генератор (/stop, прерывание): задания,
+            # которые еще не начались, снимаются, чтобы не задерживать следующий текст
+            for job in pending:
+                if not isinstance(job, np.ndarray):
+                    job.cancel()
+
+    def shutdown(self, wait: bool = False):
+        """Остановка пула; wait - дождаться завершения процессов-воркеров"""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
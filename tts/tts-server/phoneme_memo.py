@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_WAV_VALUE = 32767.0
+
+
+class PhonemeMemo:
+    """Ограниченный LRU-кэш id фонем по предложениям
+
+    Повторное предложение не проходит через espeak-ng: его id фонем сразу
+    идут в акустическую модель.
+
+    На сервере кэш фонем стоит после кэша фраз: повтор целой строки берется
+    из кэша фраз и сюда не доходит. Попадания здесь - предложения, которые
+    повторяются в разных строках, и строки, не поместившиеся в кэш фраз или
+    вытесненные из него.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (голос, предложение) -> (id фонем, время фонемизации)
+        self.lock = threading.Lock()
+
+        # Счетчики
+        self.hits = 0
+        self.misses = 0
+        self.phonemize_seconds = 0.0  # Потрачено на фонемизацию при промахах
+        self.saved_seconds = 0.0  # Сэкономлено попаданиями
+
+    def phoneme_ids(self, voice, voice_id: str, sentence: str) -> list:
+        """Id фонем предложения: список по одному на предложение espeak-ng"""
+        key = (voice_id, sentence)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += entry[1]
+                return entry[0]
+
+        started = time.perf_counter()
+        ids = [voice.phonemes_to_ids(phonemes) for phonemes in voice.phonemize(sentence) if phonemes]
+        cost = time.perf_counter() - started
+
+        with self.lock:
+            self.misses += 1
+            self.phonemize_seconds += cost
+            if self.max_entries > 0:
+                self.entries[key] = (ids, cost)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return ids
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "phonemize_seconds": round(self.phonemize_seconds, 3),
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+def ids_to_audio(voice, phoneme_ids: list, syn_config) -> np.ndarray:
+    """Акустическая модель и та же постобработка, что в PiperVoice.synthesize"""
+    audio = voice.phoneme_ids_to_audio(phoneme_ids, syn_config)
+
+    if syn_config.normalize_audio:
+        max_val = np.max(np.abs(audio))
+        if max_val < 1e-8:
+            audio = np.zeros_like(audio)
+        else:
+            audio = audio / max_val
+
+    if syn_config.volume != 1.0:
+        audio = audio * syn_config.volume
+
+    audio = np.clip(audio, -1.0, 1.0)
+    return np.clip(audio * MAX_WAV_VALUE, -MAX_WAV_VALUE, MAX_WAV_VALUE).astype(np.int16)
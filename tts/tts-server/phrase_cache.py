@@ -0,0 +1,123 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_phrase(text: str) -> str:
+    """Нормализация строки для ключа кэша (пробелы схлопываются)"""
+    return " ".join(text.split())
+
+
+def make_key(text: str, voice_id: str, params: Optional[dict] = None) -> str:
+    """Ключ кэша: хэш нормализованного текста, голоса и параметров синтеза"""
+    params_str = ";".join(f"{k}={params[k]}" for k in sorted(params or {}))
+    raw = "\x00".join([voice_id, params_str, normalize_phrase(text)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PhraseCache:
+    """Двухуровневый кэш синтезированных фраз: LRU в памяти + PCM на диске"""
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+
+        # Счетчики
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        # Раскладываем по подкаталогам, чтобы не держать тысячи файлов в одном
+        return os.path.join(self.disk_dir, key[:2], key + ".pcm")
+
+    def _remember(self, key: str, audio: np.ndarray):
+        """Помещение в LRU с вытеснением старых записей (вызывать под lock)"""
+        if audio.nbytes > self.max_bytes:
+            return
+
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old.nbytes
+
+        self.entries[key] = audio
+        self.current_bytes += audio.nbytes
+
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Поиск фразы сначала в памяти, затем на диске"""
+        with self.lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                audio = np.fromfile(path, dtype=np.int16)
+            except (FileNotFoundError, OSError):
+                audio = None
+
+            if audio is not None:
+                audio.flags.writeable = False
+                with self.lock:
+                    self.disk_hits += 1
+                    self._remember(key, audio)
+                return audio
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, audio: np.ndarray):
+        """Сохранение синтезированной фразы"""
+        audio = np.ascontiguousarray(audio, dtype=np.int16)
+        # Записи общие для всех потоков, поэтому защищаем их от изменения
+        audio.flags.writeable = False
+
+        with self.lock:
+            self._remember(key, audio)
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                return
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Пишем во временный файл и атомарно переименовываем,
+                # чтобы параллельное чтение не увидело обрезанный PCM
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                audio.tofile(tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Ошибка записи кэша на диск: {e}")
+
+    def stats(self) -> dict:
+        """Счетчики для /status"""
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,208 @@
+import threading
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+import audio_io
+
+
+def resample(audio: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Линейная передискретизация int16 под частоту аудиовыхода"""
+    if src_rate == dst_rate or len(audio) == 0:
+        return audio
+    n_out = int(round(len(audio) * dst_rate / src_rate))
+    positions = np.arange(n_out) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.int16)
+
+
+def _call(handler):
+    """Обработчик метки из callback аудиопотока; ошибка не должна его остановить"""
+    if handler is None:
+        return
+    try:
+        handler()
+    except Exception as e:
+        print(f"Ошибка в обработчике метки воспроизведения: {e}")
+
+
+class _Marker:
+    """Метка конца высказывания в очереди воспроизведения"""
+    def __init__(self, utterance, on_reached=None):
+        self.utterance = utterance
+        self.event = threading.Event()
+        self.on_reached = on_reached  # Вызывается из callback аудиопотока
+
+
+class _Buffer:
+    """PCM-буфер в очереди; on_start вызывается, когда его первый сэмпл уходит на устройство"""
+    def __init__(self, utterance, audio: np.ndarray, on_start=None):
+        self.utterance = utterance
+        self.audio = audio
+        self.on_start = on_start
+
+
+class PlaybackEngine:
+    """Единственный долгоживущий аудиовыход, питаемый очередью PCM-буферов
+
+    Буферы и метки помечаются высказыванием из begin_utterance, поэтому
+    flush может сбросить звук одного высказывания, не трогая соседние.
+    """
+    def __init__(self, samplerate: int, blocksize: int = 4096, max_buffered_ms: int = 2000):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        # Сколько сэмплов может ждать воспроизведения; write блокируется сверх этого
+        self.max_buffered = int(samplerate * max_buffered_ms / 1000)
+
+        self.items = deque()  # _Buffer или _Marker
+        self.offset = 0  # Позиция внутри первого буфера очереди
+        self.buffered = 0  # Сэмплов в очереди
+        self.pending_utterances = 0
+        self.writing = None  # Высказывание, в которое пишет write
+        self.underflows = 0  # Сколько раз устройству не хватило данных
+        self.cond = threading.Condition()
+        self.stream = None
+
+    @property
+    def is_playing(self) -> bool:
+        return self.pending_utterances > 0 or self.buffered > 0
+
+    def start(self) -> bool:
+        """Открытие аудиопотока на все время работы сервера"""
+        try:
+            self.stream = audio_io.open_output(self.samplerate, self.blocksize, self._callback)
+            self.stream.start()
+            return True
+        except Exception as e:
+            print(f"Ошибка при инициализации аудиопотока: {e}")
+            self.stream = None
+            return False
+
+    def close(self):
+        """Остановка потока; все ожидающие получают сигнал завершения"""
+        self.flush()
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception:
+                pass
+            self.stream = None
+        with self.cond:
+            self.cond.notify_all()
+
+    def begin_utterance(self, utterance=None):
+        """Начало высказывания: is_playing остается True до его метки конца
+
+        utterance - ключ высказывания для flush(utterance).
+        """
+        with self.cond:
+            self.pending_utterances += 1
+            self.writing = utterance
+
+    def write(self, audio: np.ndarray, on_start=None) -> bool:
+        """Постановка PCM в очередь; блокируется, пока буфер заполнен
+
+        on_start вызывается из callback аудиопотока, когда устройство начинает
+        воспроизводить этот буфер. Если буфер сброшен раньше, on_start не
+        вызывается вовсе.
+        """
+        if len(audio) == 0:
+            return True
+
+        with self.cond:
+            # Большой буфер принимаем целиком, когда очередь пуста,
+            # иначе он никогда бы не поместился
+            self.cond.wait_for(
+                lambda: self.stream is None
+                or self.buffered == 0
+                or self.buffered + len(audio) <= self.max_buffered
+            )
+            if self.stream is None:
+                return False
+            self.items.append(_Buffer(self.writing, audio, on_start))
+            self.buffered += len(audio)
+        return True
+
+    def end_utterance(self, on_end=None) -> threading.Event:
+        """Метка конца высказывания; событие взводится, когда звук отдан устройству"""
+        marker = _Marker(self.writing, on_end)
+        with self.cond:
+            if self.stream is None:
+                self._reach(marker)
+            else:
+                self.items.append(marker)
+        return marker.event
+
+    def flush(self, utterance=None):
+        """Сброс невоспроизведенного звука высказывания (None - всего звука)
+
+        Метки конца сброшенных высказываний срабатывают.
+        """
+        with self.cond:
+            kept = deque()
+            for index, item in enumerate(self.items):
+                if utterance is not None and item.utterance != utterance:
+                    kept.append(item)
+                elif isinstance(item, _Marker):
+                    self._reach(item)
+                else:
+                    # Первый буфер мог быть уже частично воспроизведен
+                    self.buffered -= len(item.audio) - (self.offset if index == 0 else 0)
+                    if index == 0:
+                        self.offset = 0
+            self.items = kept
+            self.cond.notify_all()
+
+    def _reach(self, marker: _Marker):
+        """Обработка метки (вызывать под cond)"""
+        _call(marker.on_reached)
+        self.pending_utterances -= 1
+        marker.event.set()
+
+    def _callback(self, outdata, frames, time_info, status):
+        """Callback аудиопотока: берет сэмплы из очереди, остаток заполняет тишиной"""
+        out = outdata[:, 0]
+        filled = 0
+
+        if status.output_underflow:
+            self.underflows += 1
+
+        with self.cond:
+            if not self.items:
+                out[:] = 0
+                return
+
+            while self.items and filled < frames:
+                item = self.items[0]
+                if isinstance(item, _Marker):
+                    self.items.popleft()
+                    self._reach(item)
+                    continue
+
+                if self.offset == 0 and item.on_start is not None:
+                    _call(item.on_start)
+                    item.on_start = None
+
+                n = min(frames - filled, len(item.audio) - self.offset)
+                out[filled:filled + n] = item.audio[self.offset:self.offset + n]
+                filled += n
+                self.offset += n
+                if self.offset >= len(item.audio):
+                    self.items.popleft()
+                    self.offset = 0
+
+            # Метки конца сразу за последним буфером тоже закрываем
+            while self.items and isinstance(self.items[0], _Marker):
+                self._reach(self.items.popleft())
+
+            self.buffered -= filled
+            self.cond.notify_all()
+
+        if filled < frames:
+            out[filled:] = 0
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание, пока очередь воспроизведения опустеет"""
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.items, timeout)
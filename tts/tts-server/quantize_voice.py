@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Квантованные варианты голосов Piper и сравнение их с исходной моделью.
+
+Примеры:
+  python3 quantize_voice.py quantize ru_RU-irina-medium.onnx
+  python3 quantize_voice.py compare ru_RU-irina-medium.onnx ru_RU-irina-medium.int8.onnx \\
+      --text hello-repka-pi.txt --json report.json
+
+quantize записывает веса в int8 (динамическое квантование ONNX Runtime) и
+кладет рядом копию конфигурации, так что вариант виден серверу как голос
+"<имя>.int8". С TTS_VOICE_VARIANT=int8 сервер подставляет его вместо
+исходной модели.
+
+compare синтезирует одни и те же тексты обеими моделями без шума
+(noise_scale=0), поэтому разница в звуке - только от квантования: скорость
+(RTF), размер и память модели, спектральное расстояние и SNR.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from piper import PiperVoice, SynthesisConfig
+
+from voice_pool import current_rss
+
+DEFAULT_SUFFIX = "int8"
+
+TEXTS = [
+    "Привет! Я голосовой помощник на плате Репка Пи.",
+    "Температура в комнате двадцать два градуса, влажность сорок процентов.",
+    "Через пять минут начнется совещание в переговорной на втором этаже.",
+]
+
+# Кадры для спектрального сравнения
+FRAME = 1024
+HOP = 256
+
+
+def quantized_path(model_path: str, suffix: str = DEFAULT_SUFFIX) -> str:
+    return model_path[:-len(".onnx")] + f".{suffix}.onnx"
+
+
+def quantize(args):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_path = args.model
+    output = args.output or quantized_path(model_path)
+    config_path = model_path + ".json"
+    if not os.path.exists(config_path):
+        print(f"Нет конфигурации голоса: {config_path}", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.monotonic()
+    quantize_dynamic(model_path, output, weight_type=QuantType.QInt8,
+                     per_channel=args.per_channel,
+                     op_types_to_quantize=args.ops.split(",") if args.ops else None)
+    # Конфигурация та же: фонемы, частота и параметры синтеза не меняются
+    shutil.copyfile(config_path, output + ".json")
+
+    size_before = os.path.getsize(model_path)
+    size_after = os.path.getsize(output)
+    print(f"Готово за {time.monotonic() - started:.1f} с: {output}")
+    print(f"Размер: {size_before / 2 ** 20:.1f} МБ -> {size_after / 2 ** 20:.1f} МБ "
+          f"({size_after / size_before:.0%})")
+
+
+def synthesize(voice, text, syn_config) -> np.ndarray:
+    chunks = [chunk.audio_int16_array for chunk in voice.synthesize(text, syn_config=syn_config)]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+
+def log_spectrum(audio: np.ndarray) -> np.ndarray:
+    """Спектр мощности в дБ по кадрам с окном Ханна"""
+    audio = audio.astype(np.float32) / 32768.0
+    if len(audio) < FRAME:
+        audio = np.pad(audio, (0, FRAME - len(audio)))
+    n_frames = 1 + (len(audio) - FRAME) // HOP
+    index = np.arange(FRAME)[None, :] + HOP * np.arange(n_frames)[:, None]
+    spectrum = np.abs(np.fft.rfft(audio[index] * np.hanning(FRAME), axis=1)) ** 2
+    return 10.0 * np.log10(spectrum + 1e-10)
+
+
+def audio_distance(reference: np.ndarray, test: np.ndarray) -> dict:
+    """Спектральное расстояние (дБ) и SNR (дБ) по общей длине двух записей"""
+    n = min(len(reference), len(test))
+    if n == 0:
+        return {"lsd_db": None, "snr_db": None, "length_ratio": None}
+    ref, tst = reference[:n], test[:n]
+
+    ref_spec, tst_spec = log_spectrum(ref), log_spectrum(tst)
+    lsd = float(np.mean(np.sqrt(np.mean((ref_spec - tst_spec) ** 2, axis=1))))
+
+    ref = ref.astype(np.float64)
+    noise = np.sum((ref - tst.astype(np.float64)) ** 2)
+    snr = 10.0 * np.log10(np.sum(ref ** 2) / noise) if noise > 0 else float("inf")
+    return {"lsd_db": round(lsd, 2), "snr_db": round(snr, 2),
+            "length_ratio": round(len(test) / len(reference), 4)}
+
+
+def measure(model_path, texts, syn_config, repeat):
+    """Загрузка модели, прогрев и синтез текстов: время, память, звук"""
+    rss_before = current_rss()
+    started = time.monotonic()
+    voice = PiperVoice.load(model_path)
+    load_seconds = time.monotonic() - started
+    rss_after = current_rss()
+
+    # Первый прогон инициализирует espeak-ng и аллокаторы - не учитываем
+    synthesize(voice, texts[0], syn_config)
+
+    rate = voice.config.sample_rate
+    audio = []
+    wall = 0.0
+    audio_seconds = 0.0
+    for _ in range(repeat):
+        audio = []
+        for text in texts:
+            started = time.perf_counter()
+            samples = synthesize(voice, text, syn_config)
+            wall += time.perf_counter() - started
+            audio_seconds += len(samples) / rate
+            audio.append(samples)
+
+    return audio, {
+        "model": model_path,
+        "size_mb": round(os.path.getsize(model_path) / 2 ** 20, 1),
+        "rss_mb": round((rss_after - rss_before) / 2 ** 20, 1),
+        "load_seconds": round(load_seconds, 2),
+        "synth_seconds": round(wall, 3),
+        "rtf": round(wall / audio_seconds, 4) if audio_seconds else None,
+    }
+
+
+def compare(args):
+    texts = TEXTS
+    if args.text:
+        texts = []
+        for path in args.text:
+            with open(path, encoding="utf-8") as f:
+                texts += [line.strip() for line in f if line.strip()]
+    if not texts:
+        print("Нет текстов для сравнения", file=sys.stderr)
+        sys.exit(1)
+
+    # Без шума синтез детерминирован: разница только от модели
+    syn_config = SynthesisConfig(noise_scale=0.0, noise_w_scale=0.0)
+
+    models = [args.reference] + args.variants
+    results = []
+    reference_audio = None
+    for model_path in models:
+        # Каждая модель в своем процессе: память не смешивается с предыдущей
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            audio, result = pool.submit(measure, model_path, texts, syn_config, args.repeat).result()
+        if reference_audio is None:
+            reference_audio = audio
+        else:
+            distances = [audio_distance(ref, tst) for ref, tst in zip(reference_audio, audio)]
+            for key in ("lsd_db", "snr_db", "length_ratio"):
+                values = [d[key] for d in distances if d[key] is not None]
+                result[key] = round(float(np.mean(values)), 4) if values else None
+            result["speedup"] = round(results[0]["rtf"] / result["rtf"], 2) if result["rtf"] else None
+        results.append(result)
+
+    print(f"{'Модель':40} {'МБ':>6} {'RSS МБ':>7} {'RTF':>7} {'x':>5} {'LSD дБ':>7} {'SNR дБ':>7}")
+    for r in results:
+        print(f"{os.path.basename(r['model']):40} {r['size_mb']:>6} {r['rss_mb']:>7} {r['rtf']:>7} "
+              f"{r.get('speedup', 1.0):>5} {r.get('lsd_db', '-'):>7} {r.get('snr_db', '-'):>7}")
+    print("LSD - среднее спектральное расстояние (меньше - ближе к исходной модели); "
+          "SNR - отношение исходного звука к разнице (больше - ближе)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"texts": len(texts), "repeat": args.repeat, "results": results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Отчет: {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Квантование голосов Piper и сравнение вариантов")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    q = sub.add_parser("quantize", help="int8-вариант модели")
+    q.add_argument("model", help="исходная модель *.onnx (рядом *.onnx.json)")
+    q.add_argument("--output", help=f"путь результата (по умолчанию <имя>.{DEFAULT_SUFFIX}.onnx)")
+    q.add_argument("--per-channel", action="store_true", help="масштаб на каждый канал весов")
+    q.add_argument("--ops", help="типы операций через запятую (по умолчанию все поддерживаемые)")
+    q.set_defaults(func=quantize)
+
+    c = sub.add_parser("compare", help="скорость, память и отличие звука от исходной модели")
+    c.add_argument("reference", help="исходная модель")
+    c.add_argument("variants", nargs="+", help="варианты для сравнения")
+    c.add_argument("--text", action="append", help="текстовый файл (по строкам), можно несколько")
+    c.add_argument("--repeat", type=int, default=3, help="повторов синтеза для замера скорости")
+    c.add_argument("--json", help="сохранить отчет в JSON")
+    c.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Optional
+
+from phrase_cache import normalize_phrase
+
+# Уровни приоритета: больше - важнее
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 1
+PRIORITY_HIGH = 2
+PRIORITY_URGENT = 3
+
+
+class SpeechItem:
+    """Текст в очереди на воспроизведение"""
+    def __init__(self, text: str, voice: str, priority: int, seq: int,
+                 enqueued_at: float, expires_at: Optional[float], engine: str = "auto"):
+        self.text = text
+        self.voice = voice
+        self.engine = engine  # piper, espeak или auto - выбор при начале синтеза
+        self.priority = priority
+        self.seq = seq  # Порядок поступления внутри одного приоритета
+        self.enqueued_at = enqueued_at
+        self.expires_at = expires_at  # None - без срока жизни
+        self.coalesced = 0  # Сколько повторов склеено с этим текстом
+        self.cancel = threading.Event()  # Прервать синтез и воспроизведение
+
+    @property
+    def key(self):
+        return (normalize_phrase(self.text), self.voice)
+
+
+class SpeechQueue:
+    """Очередь речи с приоритетами, склейкой повторов и сроком жизни
+
+    Элементы выдаются по убыванию приоритета, внутри приоритета - в порядке
+    поступления. Повтор текста, который еще ждет в очереди, не добавляется,
+    а поднимает приоритет и продлевает срок жизни уже стоящего элемента.
+
+    Элемент активен от get() до finished(): синтез заканчивается раньше, чем
+    звук уходит из буфера воспроизведения, поэтому активных может быть
+    несколько - звучащий и синтезируемый следом.
+    """
+    def __init__(self):
+        self.heap = []  # (-priority, seq, item); устаревшие записи пропускаются
+        self.pending = {}  # key -> SpeechItem
+        self.current = None  # Элемент, который сейчас синтезируется
+        self.active = []  # Взятые из очереди и еще не доигранные, по порядку
+        self.closed = False
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+
+        # Счетчики
+        self.coalesced = 0
+        self.expired = 0
+        self.preempted = 0
+        self.dropped = 0
+
+    def qsize(self) -> int:
+        return len(self.pending)
+
+    def put(self, text: str, voice: str, priority: int = PRIORITY_NORMAL,
+            ttl: Optional[float] = None, preempt: bool = False, engine: str = "auto"):
+        """Постановка текста; возвращает (элемент, был ли он склеен с повтором,
+        прерванные элементы)
+
+        preempt прерывает активные высказывания, которые не важнее нового.
+        """
+        now = time.monotonic()
+        expires_at = now + ttl if ttl is not None else None
+
+        with self.cond:
+            key = (normalize_phrase(text), voice)
+            item = self.pending.get(key)
+            coalesced = item is not None
+
+            if coalesced:
+                self.coalesced += 1
+                item.coalesced += 1
+                if item.expires_at is not None:
+                    item.expires_at = None if expires_at is None else max(item.expires_at, expires_at)
+                if priority > item.priority:
+                    # Старая запись в куче станет устаревшей
+                    item.priority = priority
+                    heapq.heappush(self.heap, (-priority, item.seq, item))
+            else:
+                item = SpeechItem(text, voice, priority, next(self.seq), now, expires_at, engine)
+                self.pending[key] = item
+                heapq.heappush(self.heap, (-priority, item.seq, item))
+
+            # Под той же блокировкой, что и get: новый элемент не может
+            # оказаться активным и прервать сам себя
+            cancelled = []
+            if preempt:
+                cancelled = self._cancel([a for a in self.active if a.priority <= item.priority])
+
+            self.cond.notify()
+        return item, coalesced, cancelled
+
+    def get(self, timeout: Optional[float] = None) -> Optional[SpeechItem]:
+        """Следующий элемент; None после close() или по таймауту"""
+        with self.cond:
+            while True:
+                item = self._pop()
+                if item is not None:
+                    self.current = item
+                    self.active.append(item)
+                    return item
+                if self.closed:
+                    return None
+                if not self.cond.wait(timeout):
+                    return None
+
+    def _pop(self) -> Optional[SpeechItem]:
+        """Извлечение из кучи с пропуском устаревших и просроченных (под cond)"""
+        now = time.monotonic()
+        while self.heap:
+            neg_priority, _, item = heapq.heappop(self.heap)
+            if -neg_priority != item.priority or self.pending.get(item.key) is not item:
+                continue
+            del self.pending[item.key]
+            if item.expires_at is not None and item.expires_at < now:
+                self.expired += 1
+                continue
+            return item
+        return None
+
+    def task_done(self, item: SpeechItem):
+        """Синтез элемента закончен; его звук может еще воспроизводиться"""
+        with self.cond:
+            if self.current is item:
+                self.current = None
+
+    def finished(self, item: SpeechItem):
+        """Звук элемента доигран или сброшен"""
+        with self.cond:
+            if item in self.active:
+                self.active.remove(item)
+
+    def _cancel(self, items) -> list:
+        """Прерывание элементов (под cond); возвращает действительно прерванные"""
+        cancelled = []
+        for item in items:
+            if not item.cancel.is_set():
+                item.cancel.set()
+                self.preempted += 1
+                cancelled.append(item)
+        return cancelled
+
+    def stop(self, clear: bool = False):
+        """Прерывание звучащего высказывания; clear - всех активных и всей очереди
+
+        Возвращает (прерванные элементы, сколько ожидающих сброшено).
+        """
+        with self.cond:
+            # Первый активный и еще не прерванный - тот, что звучит
+            # (или зазвучит первым); прерванный лишь ждет своей метки конца
+            if clear:
+                targets = self.active
+            else:
+                targets = [item for item in self.active if not item.cancel.is_set()][:1]
+            cancelled = self._cancel(targets)
+            dropped = 0
+            if clear:
+                dropped = len(self.pending)
+                self.dropped += dropped
+                self.pending.clear()
+                self.heap.clear()
+            return cancelled, dropped
+
+    def close(self):
+        """Остановка: ожидающие тексты сбрасываются, get() возвращает None"""
+        with self.cond:
+            self.closed = True
+            self._cancel(self.active)
+            self.pending.clear()
+            self.heap.clear()
+            self.cond.notify_all()
+
+    def stats(self) -> dict:
+        with self.cond:
+            by_priority = {}
+            for item in self.pending.values():
+                by_priority[item.priority] = by_priority.get(item.priority, 0) + 1
+            return {
+                "size": len(self.pending),
+                "by_priority": by_priority,
+                "coalesced": self.coalesced,
+                "expired": self.expired,
+                "preempted": self.preempted,
+                "dropped": self.dropped,
+            }
@@ -0,0 +1,253 @@
+"""Нормализация русского текста перед синтезом.
+
+Числа, единицы измерения и сокращения раскрываются в слова, чтобы Piper
+читал их одинаково, а одинаковые по звучанию фразы давали одинаковый текст
+(и попадали в кэши фраз и фонем).
+"""
+import re
+
+_UNITS_M = ["ноль", "один", "два", "три", "четыре", "пять", "шесть", "семь", "восемь", "девять"]
+_UNITS_F = ["ноль", "одна", "две"] + _UNITS_M[3:]
+_TEENS = ["десять", "одиннадцать", "двенадцать", "тринадцать", "четырнадцать", "пятнадцать",
+          "шестнадцать", "семнадцать", "восемнадцать", "девятнадцать"]
+_TENS = ["", "", "двадцать", "тридцать", "сорок", "пятьдесят", "шестьдесят", "семьдесят",
+         "восемьдесят", "девяносто"]
+_HUNDREDS = ["", "сто", "двести", "триста", "четыреста", "пятьсот", "шестьсот", "семьсот",
+             "восемьсот", "девятьсот"]
+
+# Разряды: формы для 1, 2-4, 5+ и женский ли род
+_SCALES = [
+    (("тысяча", "тысячи", "тысяч"), True),
+    (("миллион", "миллиона", "миллионов"), False),
+    (("миллиард", "миллиарда", "миллиардов"), False),
+]
+
+_FRACTIONS = {1: ("десятая", "десятых"), 2: ("сотая", "сотых"), 3: ("тысячная", "тысячных")}
+
+# Единицы после числа: формы для 1, 2-4, 5+ и женский ли род
+UNITS = {
+    "%": (("процент", "процента", "процентов"), False),
+    "°C": (("градус Цельсия", "градуса Цельсия", "градусов Цельсия"), False),
+    "°С": (("градус Цельсия", "градуса Цельсия", "градусов Цельсия"), False),
+    "°": (("градус", "градуса", "градусов"), False),
+    "км/ч": (("километр в час", "километра в час", "километров в час"), False),
+    "м/с": (("метр в секунду", "метра в секунду", "метров в секунду"), False),
+    "км": (("километр", "километра", "километров"), False),
+    "м": (("метр", "метра", "метров"), False),
+    "см": (("сантиметр", "сантиметра", "сантиметров"), False),
+    "мм": (("миллиметр", "миллиметра", "миллиметров"), False),
+    "кг": (("килограмм", "килограмма", "килограммов"), False),
+    "л": (("литр", "литра", "литров"), False),
+    "мВ": (("милливольт", "милливольта", "милливольт"), False),
+    "В": (("вольт", "вольта", "вольт"), False),
+    "мА": (("миллиампер", "миллиампера", "миллиампер"), False),
+    "А": (("ампер", "ампера", "ампер"), False),
+    "кВт": (("киловатт", "киловатта", "киловатт"), False),
+    "Вт": (("ватт", "ватта", "ватт"), False),
+    "кГц": (("килогерц", "килогерца", "килогерц"), False),
+    "МГц": (("мегагерц", "мегагерца", "мегагерц"), False),
+    "Гц": (("герц", "герца", "герц"), False),
+    "дБ": (("децибел", "децибела", "децибел"), False),
+    "ГБ": (("гигабайт", "гигабайта", "гигабайт"), False),
+    "МБ": (("мегабайт", "мегабайта", "мегабайт"), False),
+    "ч": (("час", "часа", "часов"), False),
+    "мин": (("минута", "минуты", "минут"), True),
+    "сек": (("секунда", "секунды", "секунд"), True),
+    "мс": (("миллисекунда", "миллисекунды", "миллисекунд"), True),
+    "руб": (("рубль", "рубля", "рублей"), False),
+    "₽": (("рубль", "рубля", "рублей"), False),
+    "коп": (("копейка", "копейки", "копеек"), True),
+    "шт": (("штука", "штуки", "штук"), True),
+    "тыс": (("тысяча", "тысячи", "тысяч"), True),
+    "млн": (("миллион", "миллиона", "миллионов"), False),
+    "млрд": (("миллиард", "миллиарда", "миллиардов"), False),
+}
+
+# Сокращения без числа
+ABBREVIATIONS = {
+    "т.е.": "то есть",
+    "т.д.": "так далее",
+    "т.п.": "тому подобное",
+    "т.к.": "так как",
+    "и др.": "и другие",
+    "напр.": "например",
+    "см.": "смотри",
+    "ул.": "улица",
+    "№": "номер ",
+}
+
+# Разделитель разрядов - неразрывный пробел; обычный пробел - только если
+# групп две и больше (1 000 000) или группа начинается с нуля (1 000, 12 050):
+# "в 5 100 домах" - два числа, но перед единицей одна группа тоже считается
+# разрядом: "1 500 руб". Номера версий вида 1.2.3 числами не считаются
+_GROUPED = (r"\d{1,3}(?:[  ]\d{3})+"
+            r"|\d{1,3}(?: \d{3}){2,}"
+            r"|\d{1,3}(?: \d{3})* 0\d{2}(?: \d{3})*")
+
+
+def _number_pattern(grouped: str) -> str:
+    # Цифры рядом с двоеточием - время или отношение, а не отдельные числа
+    return (r"(?<![\w.,:])(-?)(" + grouped + r"|\d+)"
+            r"(?:[.,](\d{1,3}))?(?![.,:]?\d)")
+
+
+_NUMBER = _number_pattern(_GROUPED)
+
+
+def _unit_pattern(unit: str) -> str:
+    # Заглавная буква перед словом - литера дома или начало предложения:
+    # "дом 5 В центре", "Купил 3 А потом"
+    if len(unit) == 1 and unit.isupper():
+        return re.escape(unit) + r"(?!\s*[А-Яа-яЁё])"
+    return re.escape(unit)
+
+
+# Длинные варианты единиц проверяются раньше коротких
+_UNIT_ALT = "|".join(_unit_pattern(u) for u in sorted(UNITS, key=len, reverse=True))
+# Точка сокращения съедается, если за ней не начинается новое предложение
+_UNIT_DOT = r"(?:\.(?!\s*(?:[A-ZА-ЯЁ]|$)))?"
+_NUMBER_UNIT_RE = re.compile(_number_pattern(_GROUPED + r"|\d{1,3} \d{3}")
+                             + r"\s?(" + _UNIT_ALT + r")(?!\w)" + _UNIT_DOT)
+_NUMBER_RE = re.compile(_NUMBER + r"(?!\w)")
+# Единица после разряда прописью: "2 тыс. руб" - две тысячи рублей
+_SCALE_WORDS = "|".join(form for forms, _ in _SCALES for form in sorted(forms, key=len, reverse=True))
+_SCALE_UNIT_RE = re.compile(r"(?<!\w)(" + _SCALE_WORDS + r")\s(" + _UNIT_ALT + r")(?!\w)" + _UNIT_DOT)
+_TIME_RE = re.compile(r"(?<![\d:])([01]?\d|2[0-3]|24(?=:00)):([0-5]\d)(?![\d:])")
+_ABBR_RE = re.compile(
+    r"(?<!\w)(?:" + "|".join(re.escape(a) for a in sorted(ABBREVIATIONS, key=len, reverse=True)) + ")",
+    re.IGNORECASE)
+
+MAX_NUMBER = 10 ** 12
+# Сплошные цифры такой длины - телефон или код: читаются по цифрам
+DIGIT_RUN = 11
+
+
+def plural(n: int, forms) -> str:
+    """Форма слова после числа: 1 час, 2 часа, 5 часов"""
+    n = abs(n) % 100
+    if 10 < n < 20:
+        return forms[2]
+    if n % 10 == 1:
+        return forms[0]
+    if 2 <= n % 10 <= 4:
+        return forms[1]
+    return forms[2]
+
+
+def _triplet(n: int, feminine: bool) -> list:
+    words = []
+    if n >= 100:
+        words.append(_HUNDREDS[n // 100])
+        n %= 100
+    if 10 <= n < 20:
+        words.append(_TEENS[n - 10])
+        return words
+    if n >= 20:
+        words.append(_TENS[n // 10])
+        n %= 10
+    if n:
+        words.append((_UNITS_F if feminine else _UNITS_M)[n])
+    return words
+
+
+def number_to_words(n: int, feminine: bool = False) -> str:
+    """Целое число прописью в именительном падеже"""
+    if n < 0:
+        return "минус " + number_to_words(-n, feminine)
+    if n == 0:
+        return _UNITS_M[0]
+    if n >= MAX_NUMBER:
+        # Номера и коды читаем по цифрам
+        return " ".join(_UNITS_M[int(d)] for d in str(n))
+
+    words = []
+    scale_index = len(_SCALES)
+    for forms, scale_feminine in reversed(_SCALES):
+        scale_index -= 1
+        divisor = 1000 ** (scale_index + 1)
+        part = n // divisor
+        n %= divisor
+        if part:
+            words.extend(_triplet(part, scale_feminine))
+            words.append(plural(part, forms))
+    words.extend(_triplet(n, feminine))
+    return " ".join(words)
+
+
+def _number_words(sign: str, whole: str, fraction, feminine: bool) -> tuple:
+    """Слова числа и форма единицы для него: индекс в (1, 2-4, 5+)"""
+    digits = re.sub(r"\D", "", whole)
+    value = int(digits)
+    if fraction is None and digits == whole and len(digits) >= DIGIT_RUN:
+        words = " ".join(_UNITS_M[int(d)] for d in digits)
+        form = 2
+    elif fraction is None:
+        words = number_to_words(value, feminine)
+        form = plural(value, (0, 1, 2))
+    else:
+        # 3,5 - три целых пять десятых (градуса)
+        denominator = _FRACTIONS[len(fraction)]
+        numerator = int(fraction)
+        words = (f"{number_to_words(value, True)} {plural(value, ('целая', 'целых', 'целых'))} "
+                 f"{number_to_words(numerator, True)} "
+                 f"{denominator[0] if plural(numerator, (0, 1, 2)) == 0 else denominator[1]}")
+        form = 1
+    if sign:
+        words = "минус " + words
+    return words, form
+
+
+def _expand_number_unit(match) -> str:
+    sign, whole, fraction, unit = match.groups()
+    forms, feminine = UNITS[unit]
+    words, form = _number_words(sign, whole, fraction, feminine)
+    return f"{words} {forms[form]}"
+
+
+def _expand_scale_unit(match) -> str:
+    # После тысячи, миллиона и миллиарда - всегда родительный падеж множественного числа
+    scale, unit = match.groups()
+    return f"{scale} {UNITS[unit][0][2]}"
+
+
+def _expand_number(match) -> str:
+    sign, whole, fraction = match.groups()
+    return _number_words(sign, whole, fraction, False)[0]
+
+
+def _expand_time(match) -> str:
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if minutes == 0:
+        return f"{number_to_words(hours)} {plural(hours, ('час', 'часа', 'часов'))} ровно"
+    minutes_words = number_to_words(minutes, True)
+    if minutes < 10:
+        minutes_words = "ноль " + minutes_words
+    return f"{number_to_words(hours)} {minutes_words}"
+
+
+def _expand_abbreviation(match) -> str:
+    words = ABBREVIATIONS[match.group(0).lower()]
+    return words[0].upper() + words[1:] if match.group(0)[0].isupper() else words
+
+
+def normalize_text(text: str) -> str:
+    """Раскрытие сокращений, времени, чисел и единиц измерения в слова
+
+    >>> normalize_text("Напряжение 5 В, ток 3 А.")
+    'Напряжение пять вольт, ток три ампера.'
+    >>> normalize_text("Дом 5 В центре. Купил 3 А потом ушел")
+    'Дом пять В центре. Купил три А потом ушел'
+    >>> normalize_text("Время 25:00, в 24:00 и 7:05")
+    'Время 25:00, в двадцать четыре часа ровно и семь ноль пять'
+    >>> normalize_text("Звоните 89161234567")
+    'Звоните восемь девять один шесть один два три четыре пять шесть семь'
+    >>> normalize_text("Напр. 2 тыс. руб")
+    'Например две тысячи рублей'
+    """
+    text = _TIME_RE.sub(_expand_time, text)
+    text = _NUMBER_UNIT_RE.sub(_expand_number_unit, text)
+    text = _SCALE_UNIT_RE.sub(_expand_scale_unit, text)
+    text = _NUMBER_RE.sub(_expand_number, text)
+    # Сокращения после чисел: "5 см." - это сантиметры, а не "смотри"
+    text = _ABBR_RE.sub(_expand_abbreviation, text)
+    return " ".join(text.split())
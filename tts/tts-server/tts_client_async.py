@@ -0,0 +1,228 @@
+import os
+import sys
+import time
+import struct
+import asyncio
+import argparse
+from pathlib import Path
+import aiohttp
+
+# Адрес сервера по умолчанию (можно переопределить через TTS_SERVER или --server)
+DEFAULT_SERVER = os.environ.get("TTS_SERVER", "http://192.168.0.18:8000")
+
+CONCURRENCY = 8  # Одновременных запросов
+RETRIES = 3  # Повторов после первой неудачной попытки
+BACKOFF_S = 0.5  # Пауза перед первым повтором, дальше удваивается
+TIMEOUT_S = 60
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TTSRequestError(Exception):
+    """Запрос к серверу завершился ошибкой"""
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class AsyncTTSClient:
+    """Клиент TTS-сервера с общим пулом keep-alive соединений"""
+    def __init__(self, server=DEFAULT_SERVER, concurrency=CONCURRENCY, retries=RETRIES,
+                 backoff=BACKOFF_S, timeout=TIMEOUT_S):
+        self.server = server.rstrip("/")
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.session = None
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self):
+        # Соединений в пуле столько же, сколько одновременных запросов
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def _post(self, path, payload, stats=None):
+        """POST с повторами и экспоненциальной паузой; возвращает тело ответа
+
+        В stats записываются ожидание места в пуле (queue_wait), время
+        последней попытки (latency) и число повторов (retries).
+        """
+        if stats is None:
+            stats = {}
+        stats.update(queue_wait=0.0, latency=0.0, retries=0)
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            stats["retries"] = attempt
+            waited = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    started = time.perf_counter()
+                    stats["queue_wait"] += started - waited
+                    async with self.session.post(f"{self.server}{path}", json=payload) as response:
+                        body = await response.read()
+                        stats["latency"] = time.perf_counter() - started
+                        if response.status == 200:
+                            return body
+                        error = TTSRequestError(response.status, body.decode("utf-8", "replace"))
+                        if response.status not in RETRY_STATUSES:
+                            raise error
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+
+            if attempt < self.retries:
+                await asyncio.sleep(delay)
+                delay *= 2
+        raise error
+
+    async def say(self, text, voice=None, stats=None):
+        """Воспроизведение на динамике сервера"""
+        payload = {"text": text}
+        if voice:
+            payload["voice"] = voice
+        return await self._post("/say", payload, stats)
+
+    async def synthesize(self, text, voice=None, audio_format="wav", stats=None):
+        """Синтез звука на сервере; возвращает WAV или PCM
+
+        WAV сервер отдает потоком, с максимальными размерами в заголовке;
+        здесь они исправляются по длине ответа.
+        """
+        payload = {"text": text, "format": audio_format}
+        if voice:
+            payload["voice"] = voice
+        body = await self._post("/synthesize", payload, stats)
+        if audio_format == "wav":
+            body = fix_wav_sizes(body)
+        return body
+
+    async def run_batch(self, items, handler):
+        """Параллельная обработка пар (имя, текст); возвращает список результатов
+
+        handler(имя, текст, stats) передает stats в запрос клиента.
+        """
+        async def one(name, text):
+            stats = {"queue_wait": 0.0, "latency": 0.0, "retries": 0}
+            try:
+                await handler(name, text, stats)
+                error = None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            return {"name": name, "error": error, **stats}
+
+        return await asyncio.gather(*(one(name, text) for name, text in items))
+
+
+def fix_wav_sizes(data: bytes) -> bytes:
+    """Размеры RIFF и data в 44-байтном заголовке по фактической длине"""
+    if len(data) < 44 or data[:4] != b"RIFF" or data[36:40] != b"data":
+        return data
+    data = bytearray(data)
+    struct.pack_into("<I", data, 4, len(data) - 8)
+    struct.pack_into("<I", data, 40, len(data) - 44)
+    return bytes(data)
+
+def percentile(values, q):
+    """Перцентиль по отсортированному списку (ближайший ранг)"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+def print_summary(results, elapsed):
+    """Сводка по задержкам запросов, ожиданию в очереди клиента и повторам"""
+    latencies = sorted(r["latency"] for r in results if r["error"] is None)
+    waits = sorted(r["queue_wait"] for r in results)
+    retries = sum(r["retries"] for r in results)
+    failed = [r for r in results if r["error"] is not None]
+
+    for r in failed:
+        print(f"Ошибка: {r['name']}: {r['error']}", file=sys.stderr)
+
+    print(f"\nЗапросов: {len(results)}, успешно: {len(latencies)}, ошибок: {len(failed)}, "
+          f"за {elapsed:.2f} с")
+    if latencies:
+        mean = sum(latencies) / len(latencies)
+        print(f"Задержка, с: среднее {mean:.3f}, p50 {percentile(latencies, 50):.3f}, "
+              f"p90 {percentile(latencies, 90):.3f}, p99 {percentile(latencies, 99):.3f}, "
+              f"макс {latencies[-1]:.3f}")
+    if waits:
+        print(f"Ожидание в очереди клиента, с: среднее {sum(waits) / len(waits):.3f}, "
+              f"p90 {percentile(waits, 90):.3f}, макс {waits[-1]:.3f}")
+    print(f"Повторов: {retries}")
+
+def collect_items(files, lines):
+    """Пары (имя, текст): файл целиком или каждая непустая строка отдельно"""
+    items = []
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read().strip()
+        if not text:
+            continue
+        if lines:
+            items.extend((f"{path}:{n}", line.strip())
+                         for n, line in enumerate(text.splitlines(), 1) if line.strip())
+        else:
+            items.append((path, text))
+    return items
+
+async def run(args, items):
+    async with AsyncTTSClient(args.server, args.concurrency, args.retries) as client:
+        if args.output_dir:
+            out_dir = Path(args.output_dir)
+            out_dir.mkdir(parents=True, exist_ok=True)
+
+            async def handler(name, text, stats):
+                audio = await client.synthesize(text, args.voice, "wav", stats)
+                target = out_dir / (Path(name.replace(":", "_")).name + ".wav")
+                target.write_bytes(audio)
+        else:
+            async def handler(name, text, stats):
+                await client.say(text, args.voice, stats)
+
+        return await client.run_batch(items, handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетный асинхронный клиент TTS-сервера")
+    parser.add_argument("files", nargs="+", help="текстовые файлы")
+    parser.add_argument("--server", default=DEFAULT_SERVER,
+                        help=f"адрес сервера (по умолчанию {DEFAULT_SERVER})")
+    parser.add_argument("--lines", action="store_true",
+                        help="отправлять каждую строку файла отдельным запросом")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="число одновременных запросов")
+    parser.add_argument("--retries", type=int, default=RETRIES,
+                        help="число повторов при ошибке сети или сервера")
+    parser.add_argument("--voice", help="голос (по умолчанию голос сервера)")
+    parser.add_argument("--output-dir",
+                        help="сохранять синтезированные WAV сюда вместо воспроизведения на сервере")
+    args = parser.parse_args()
+
+    try:
+        items = collect_items(args.files, args.lines)
+    except OSError as e:
+        print(f"Не удалось прочитать файл: {e}")
+        sys.exit(1)
+
+    if not items:
+        print("Нет текста для отправки!")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    try:
+        results = asyncio.run(run(args, items))
+    except KeyboardInterrupt:
+        print("\n\nПрограмма остановлена пользователем.")
+        sys.exit(1)
+
+    print_summary(results, time.perf_counter() - started)
+    if any(r["error"] is not None for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,83 @@
+import os
 import sys
+import argparse
 import requests
 import json
 
+# Адрес сервера по умолчанию (можно переопределить через TTS_SERVER или --server)
+DEFAULT_SERVER = os.environ.get("TTS_SERVER", "http://192.168.0.18:8000")
+
+READ_CHUNK = 4096
+
+def send_say(server, text):
+    """Воспроизведение на динамике сервера"""
+    # Формируем данные для отправки
+    data = {"text": text}
+    
+    # Отправляем POST запрос
+    response = requests.post(
+        f"{server}/say",
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(data, ensure_ascii=False).encode('utf-8')
+    )
+    
+    # Проверяем ответ
+    if response.status_code == 200:
+        print("Запрос успешно отправлен!")
+        print(f"Ответ сервера: {response.text}")
+    else:
+        print(f"Ошибка: {response.status_code}")
+        print(f"Ответ: {response.text}")
+
+def play_stream(server, text, encoding="pcm"):
+    """Локальное воспроизведение звука по мере его получения от сервера"""
+    import audio_io
+    from audio_codecs import make_decoder
+    
+    data = {"text": text, "format": encoding}
+    decoder = make_decoder(encoding)
+    
+    with requests.post(
+        f"{server}/synthesize",
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(data, ensure_ascii=False).encode('utf-8'),
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            print(f"Ошибка: {response.status_code}")
+            print(f"Ответ: {response.text}")
+            return
+        
+        samplerate = int(response.headers.get("X-Sample-Rate", 22050))
+        
+        with audio_io.open_output(samplerate, 0) as stream:
+            # Декодер сам собирает сэмплы, разорванные между фрагментами ответа
+            for data in response.iter_content(chunk_size=READ_CHUNK):
+                pcm = decoder.decode(data)
+                if pcm:
+                    stream.write(pcm)
+            pcm = decoder.flush()
+            if pcm:
+                stream.write(pcm)
+        
+        stats = decoder.stats()
+        print(f"Принято {stats['coded_bytes']} байт ({encoding}), звука {stats['pcm_bytes']} байт, "
+              f"декодирование {stats['cpu_seconds'] * 1000:.1f} мс")
+
 def main():
-    # Проверяем наличие аргумента командной строки
-    if len(sys.argv) != 2:
-        print("Использование: python client.py <путь_к_файлу>")
-        print("Пример: python client.py text.txt")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Клиент TTS-сервера")
+    parser.add_argument("file", help="путь к текстовому файлу")
+    parser.add_argument("--server", default=DEFAULT_SERVER,
+                        help=f"адрес сервера (по умолчанию {DEFAULT_SERVER})")
+    parser.add_argument("--play", action="store_true",
+                        help="получать звук потоком и играть его локально")
+    parser.add_argument("--encoding", default="pcm", choices=["pcm", "ulaw", "flac"],
+                        help="сжатие звука при передаче (flac требует pyflac)")
+    args = parser.parse_args()
     
     # Получаем путь к файлу из аргументов
-    file_path = sys.argv[1]
+    file_path = args.file
+    server = args.server.rstrip("/")
     
     try:
         # Читаем текст из файла
@@ -22,26 +89,10 @@ def main():
             print("Файл пуст!")
             sys.exit(1)
         
-        # Формируем данные для отправки
-        data = {"text": text}
-        
-        # URL сервера (замените на актуальный, если отличается)
-        url = "http://192.168.0.18:8000/say"
-        
-        # Отправляем POST запрос
-        response = requests.post(
-            url,
-            headers={"Content-Type": "application/json"},
-            data=json.dumps(data, ensure_ascii=False).encode('utf-8')
-        )
-        
-        # Проверяем ответ
-        if response.status_code == 200:
-            print("Запрос успешно отправлен!")
-            print(f"Ответ сервера: {response.text}")
+        if args.play:
+            play_stream(server, text, args.encoding)
         else:
-            print(f"Ошибка: {response.status_code}")
-            print(f"Ответ: {response.text}")
+            send_say(server, text)
     
     except FileNotFoundError:
         print(f"Файл не найден: {file_path}")
@@ -0,0 +1,119 @@
+import bisect
+import threading
+
+# Границы гистограмм по умолчанию, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Монотонный счетчик"""
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value}",
+        ]
+
+
+class FuncCounter:
+    """Счетчик, значение которого хранит сам источник (например, аудиовыход)"""
+    def __init__(self, name: str, help_text: str, func):
+        self.name = name
+        self.help_text = help_text
+        self.func = func
+
+    def render(self) -> list:
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.func()}",
+        ]
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def render(self) -> list:
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class _NullMetric:
+    """Заглушка для выключенных метрик: вызовы ничего не делают"""
+    value = 0
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+_NULL = _NullMetric()
+
+
+class Metrics:
+    """Реестр метрик с выдачей в текстовом формате Prometheus"""
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.metrics = []
+
+    def _register(self, metric):
+        if not self.enabled:
+            return _NULL
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str):
+        return self._register(Counter(name, help_text))
+
+    def func_counter(self, name: str, help_text: str, func):
+        return self._register(FuncCounter(name, help_text, func))
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
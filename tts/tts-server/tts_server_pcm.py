@@ -1,241 +1,695 @@
+import os
 import time
+
+# Отсчет времени запуска - до тяжелых импортов
+STARTED_AT = time.monotonic()
+
+import struct
+import dataclasses
 import numpy as np
-import sounddevice as sd
-from fastapi import FastAPI, BackgroundTasks
+import audio_io
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
-from piper import PiperVoice
+from piper import SynthesisConfig
+import asyncio
 import warnings
 import threading
-import queue
+from collections import deque
 from typing import Optional
 from contextlib import asynccontextmanager
+from phrase_cache import PhraseCache, make_key
+from playback import PlaybackEngine, resample
+from voice_pool import VoicePool, discover_voices
+from parallel_synth import ParallelSynthesizer, split_sentences
+from tts_metrics import Metrics
+from text_normalizer import normalize_text
+from audio_codecs import available_codecs, make_encoder
+from phoneme_memo import PhonemeMemo, ids_to_audio
+from speech_queue import SpeechQueue, PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_URGENT
+from espeak_engine import EspeakEngine
+from event_feed import EventFeed
 
 # Игнорируем предупреждения от sounddevice
 warnings.filterwarnings("ignore", message="Exception ignored from cffi callback")
 
-# Настройки модели
+# Настройки модели (голос по умолчанию)
 MODEL_PATH = "ru_RU-irina-medium.onnx"
 CONFIG_PATH = "ru_RU-irina-medium.onnx.json"
+DEFAULT_VOICE = os.path.basename(MODEL_PATH)[:-len(".onnx")]
+
+# Каталог с голосами: все *.onnx с конфигурацией рядом доступны по имени файла
+VOICES_DIR = os.environ.get("TTS_VOICES_DIR", ".")
+VOICES_MAX_BYTES = int(os.environ.get("TTS_VOICES_RAM_MB", 1024)) * 1024 * 1024
+
+voices = discover_voices(VOICES_DIR)
+voices.setdefault(DEFAULT_VOICE, {"model": MODEL_PATH, "config": CONFIG_PATH})
+
+# Вариант моделей (например int8 от quantize_voice.py): голос "<имя>" загружается
+# из "<имя>.<вариант>.onnx", если такой файл есть
+VOICE_VARIANT = os.environ.get("TTS_VOICE_VARIANT") or None
+if VOICE_VARIANT:
+    for name in list(voices):
+        variant = voices.get(f"{name}.{VOICE_VARIANT}")
+        if variant is not None:
+            voices[name] = dict(variant)
+            print(f"Голос {name}: вариант {VOICE_VARIANT}")
+
+# Настройки ONNX Runtime: потоки (0 - по умолчанию), уровень оптимизации графа
+# (disable, basic, extended, all) и каталог для оптимизированных моделей
+ORT_INTRA_THREADS = int(os.environ.get("TTS_ORT_INTRA_THREADS", 0))
+ORT_INTER_THREADS = int(os.environ.get("TTS_ORT_INTER_THREADS", 0))
+ORT_OPT_LEVEL = os.environ.get("TTS_ORT_OPT_LEVEL", "all")
+ORT_OPTIMIZED_DIR = os.environ.get("TTS_ORT_OPTIMIZED_DIR") or None
+
+# Прогрев: пробный синтез до того, как сервер начнет принимать запросы
+WARMUP_ENABLED = os.environ.get("TTS_WARMUP", "1") == "1"
+WARMUP_TEXT = "Сервер синтеза речи запущен. Проверка связи."
 
-# Инициализация модели
-voice = PiperVoice.load(MODEL_PATH, config_path=CONFIG_PATH)
+# Модели загружаются при первом обращении
+voice_pool = VoicePool(voices, VOICES_MAX_BYTES, ORT_INTRA_THREADS, ORT_INTER_THREADS,
+                       ORT_OPT_LEVEL, ORT_OPTIMIZED_DIR)
+syn_config = SynthesisConfig()
 
 # Глобальные переменные
-audio_queue = queue.Queue()
-samplerate = voice.config.sample_rate
-is_playing = False
-stop_worker = False
+speech_queue = SpeechQueue()
+samplerate = voice_pool.sample_rate(DEFAULT_VOICE)  # Частота аудиовыхода
 
 # Настройки аудио
 BUFFER_SIZE = 4096
 CHUNK_SIZE = 2048
-PRE_BUFFER_MS = 100
+MAX_BUFFERED_MS = 2000  # Сколько синтезированного звука может ждать вывода
+LEAD_IN_SECONDS = 0.1  # Пауза перед высказыванием
+
+# Настройки кэша фраз
+CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_DIR = os.environ.get("TTS_CACHE_DIR") or None  # None - только память
+
+phrase_cache = PhraseCache(CACHE_MAX_BYTES, CACHE_DIR)
+
+# Потоковый режим: воспроизведение начинается после синтеза первого предложения
+STREAMING_MODE = os.environ.get("TTS_STREAMING", "1") == "1"
+
+# Нормализация текста (числа, единицы, сокращения) и кэш фонем по предложениям.
+# Кэш фонем проверяется только при промахе кэша фраз, поэтому помогает
+# предложениям, повторяющимся в разных строках (см. phoneme_memo.py)
+TEXT_NORMALIZE = os.environ.get("TTS_NORMALIZE", "1") == "1"
+PHONEME_MEMO_ENTRIES = int(os.environ.get("TTS_PHONEME_MEMO", 4096))
+
+phoneme_memo = PhonemeMemo(PHONEME_MEMO_ENTRIES)
+
+# Параллельный синтез длинных текстов на пуле процессов (0 - выключен)
+PARALLEL_WORKERS = int(os.environ.get("TTS_PARALLEL_WORKERS", 0))
+PARALLEL_MIN_SENTENCES = 2  # Короткие тексты быстрее синтезировать в процессе сервера
+
+parallel_synth = None  # Создается в lifespan
+
+# Второй движок - espeak-ng в процессе сервера: звучит хуже Piper, но без задержки.
+# Выбирается в запросе (engine) или автоматически (auto) для коротких текстов
+# (не длиннее TTS_ESPEAK_MAX_CHARS, 0 - по длине не выбирается) и для текстов
+# с приоритетом не ниже TTS_ESPEAK_PRIORITY. По умолчанию выключен, чтобы
+# срочные сообщения не меняли голос без явного TTS_ESPEAK=1
+ESPEAK_ENABLED = os.environ.get("TTS_ESPEAK", "0") == "1"
+ESPEAK_VOICE = os.environ.get("TTS_ESPEAK_VOICE", "ru")
+ESPEAK_RATE = int(os.environ.get("TTS_ESPEAK_RATE", 160))  # Слов в минуту
+ESPEAK_LIB = os.environ.get("TTS_ESPEAK_LIB") or None  # По умолчанию ищется libespeak-ng
+ESPEAK_MAX_CHARS = int(os.environ.get("TTS_ESPEAK_MAX_CHARS", 0))
+ESPEAK_PRIORITY = int(os.environ.get("TTS_ESPEAK_PRIORITY", PRIORITY_URGENT))
+
+espeak_engine = EspeakEngine(ESPEAK_VOICE, ESPEAK_RATE, lib_path=ESPEAK_LIB) if ESPEAK_ENABLED else None
+
+ENGINES = ("auto", "piper", "espeak")
+
+# Выбор движков и время до первого звука синтеза по движкам
+engine_lock = threading.Lock()
+engine_stats = {name: {"requests": 0, "first_audio_seconds": 0.0, "last_first_audio": None}
+                for name in ENGINES[1:]}
+
+# Время этапов запуска для /status
+startup_info = {}
+
+# Учет передачи звука по /synthesize: итоги по кодекам и последние сессии
+transport_lock = threading.Lock()
+transport_totals = {}
+recent_transfers = deque(maxlen=20)
+
+# Типы ответа /synthesize по формату
+MEDIA_TYPES = {
+    "pcm": "audio/L16; rate={rate}; channels=1",
+    "wav": "audio/wav",
+    "ulaw": "audio/PCMU; rate={rate}; channels=1",
+    "flac": "audio/flac",
+}
+
+# Тексты с таким приоритетом прерывают текущее высказывание сами
+PREEMPT_PRIORITY = int(os.environ.get("TTS_PREEMPT_PRIORITY", PRIORITY_URGENT))
+
+# Единый аудиовыход сервера
+playback_engine = PlaybackEngine(samplerate, BUFFER_SIZE, MAX_BUFFERED_MS)
+
+# События начала и конца воспроизведения для /events (распознаватели
+# рядом с динамиком не слушают собственный голос сервера)
+event_feed = EventFeed()
+# Высказывания, чей звук сейчас на выходе (между playback_start и playback_end)
+audible_utterances = set()
+
+# Метрики для /metrics; выключенные не стоят ничего, кроме пустых вызовов
+METRICS_ENABLED = os.environ.get("TTS_METRICS", "1") == "1"
+metrics = Metrics(METRICS_ENABLED)
+say_requests = metrics.counter("tts_say_requests_total", "Запросы /say")
+synthesize_requests = metrics.counter("tts_synthesize_requests_total", "Запросы /synthesize")
+queue_wait_hist = metrics.histogram(
+    "tts_queue_wait_seconds", "Ожидание текста в очереди до начала синтеза")
+line_synthesis_hist = metrics.histogram(
+    "tts_line_synthesis_seconds", "Синтез одной строки в Piper (без попаданий в кэш)")
+chars_per_second_hist = metrics.histogram(
+    "tts_synthesis_chars_per_second", "Скорость синтеза строки, символов в секунду",
+    buckets=(10, 25, 50, 100, 200, 400, 800, 1600))
+first_audio_hist = metrics.histogram(
+    "tts_time_to_first_audio_seconds", "От постановки в очередь до первого звука на выходе")
+playback_hist = metrics.histogram(
+    "tts_playback_seconds", "Длительность воспроизведения высказывания",
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300))
+synthesis_errors = metrics.counter("tts_synthesis_errors_total", "Ошибки синтеза")
+worker_errors = metrics.counter("tts_worker_errors_total", "Ошибки аудио-воркера")
+metrics.func_counter(
+    "tts_phoneme_memo_hits_total", "Предложения, взятые из кэша фонем",
+    lambda: phoneme_memo.hits)
+metrics.func_counter(
+    "tts_phoneme_memo_misses_total", "Предложения, прошедшие фонемизацию",
+    lambda: phoneme_memo.misses)
+metrics.func_counter(
+    "tts_phoneme_memo_saved_seconds_total", "Время фонемизации, сэкономленное кэшем фонем",
+    lambda: phoneme_memo.saved_seconds)
+metrics.func_counter(
+    "tts_queue_coalesced_total", "Повторы текстов, склеенные в очереди",
+    lambda: speech_queue.coalesced)
+metrics.func_counter(
+    "tts_queue_expired_total", "Тексты, отброшенные по истечении срока жизни",
+    lambda: speech_queue.expired)
+metrics.func_counter(
+    "tts_preempted_total", "Прерванные высказывания",
+    lambda: speech_queue.preempted)
+engine_piper_requests = metrics.counter(
+    "tts_engine_piper_requests_total", "Тексты, синтезированные Piper")
+engine_espeak_requests = metrics.counter(
+    "tts_engine_espeak_requests_total", "Тексты, синтезированные espeak-ng")
+espeak_synthesis_hist = metrics.histogram(
+    "tts_espeak_synthesis_seconds", "Синтез одной строки в espeak-ng")
+metrics.func_counter(
+    "tts_output_underflows_total", "Нехватка данных на аудиовыходе (по sounddevice)",
+    lambda: playback_engine.underflows)
 
 class TTSRequest(BaseModel):
     text: str
+    voice: Optional[str] = None  # Имя голоса, по умолчанию DEFAULT_VOICE
+    engine: str = "auto"  # piper, espeak или auto - выбор по длине и приоритету
 
-class AudioPlayerThread(threading.Thread):
-    """Поток-плейер для воспроизведения аудио"""
-    def __init__(self, audio_data, samplerate, player_id=0):
-        threading.Thread.__init__(self)
-        self.audio_data = audio_data
-        self.samplerate = samplerate
-        self.player_id = player_id
-        self.stream = None
-        self.daemon = True
-    
-    def init_stream(self):
-        """Инициализация аудиопотока"""
-        try:
-            if self.stream is not None:
-                try:
-                    self.stream.stop()
-                    self.stream.close()
-                except:
-                    pass
-            
-            self.stream = sd.OutputStream(
-                samplerate=self.samplerate,
-                channels=1,
-                dtype='int16',
-                blocksize=BUFFER_SIZE,
-                latency='high'
-            )
-            self.stream.start()
-            
-            # Заполняем буфер тишиной
-            pre_buffer_samples = int((PRE_BUFFER_MS / 1000.0) * self.samplerate)
-            silence = np.zeros(pre_buffer_samples, dtype=np.int16)
-            self.stream.write(silence)
-            time.sleep(pre_buffer_samples / self.samplerate + 0.01)
-            
-            return True
-            
-        except Exception as e:
-            print(f"Ошибка при инициализации аудиопотока: {e}")
-            self.stream = None
-            return False
-    
-    def run(self):
-        """Запуск воспроизведения"""
-        global is_playing
-        
-        try:
-            is_playing = True
-            
-            if not self.init_stream():
-                is_playing = False
-                return
-            
-            audio_data = self.audio_data
-            total_samples = len(audio_data)
-            
-            if total_samples == 0:
-                is_playing = False
-                return
-            
-            # Воспроизводим аудио
-            try:
-                self.stream.write(audio_data)
-                estimated_play_time = total_samples / self.samplerate
-                time.sleep(estimated_play_time + 0.05)
-            except Exception as e:
-                print(f"Ошибка при воспроизведении: {e}")
-            
-        except Exception as e:
-            print(f"Ошибка в потоке-плейере: {e}")
-        
-        finally:
-            if self.stream is not None:
-                try:
-                    time.sleep(0.02)
-                    self.stream.stop()
-                    self.stream.close()
-                except:
-                    pass
-                self.stream = None
-            
-            is_playing = False
-
-def synthesize_text(text: str) -> Optional[np.ndarray]:
-    """Синтез текста в аудиоданные"""
+class SayRequest(TTSRequest):
+    priority: int = PRIORITY_NORMAL  # 0 - низкий ... 3 - срочный
+    ttl: Optional[float] = None  # Через сколько секунд текст устаревает
+    preempt: bool = False  # Прервать текущее высказывание
+
+class StopRequest(BaseModel):
+    clear: bool = False  # Сбросить и все ожидающие тексты
+
+class SynthesizeRequest(TTSRequest):
+    format: str = "pcm"  # pcm - сырой int16, wav - с WAV-заголовком, ulaw, flac - сжатие
+
+def espeak_available() -> bool:
+    return espeak_engine is not None and espeak_engine.available()
+
+def choose_engine(requested: str, text: str, priority: int = PRIORITY_NORMAL) -> str:
+    """Движок для текста: явно запрошенный или выбранный по длине и приоритету"""
+    if requested != "auto":
+        return requested
+    if not espeak_available():
+        return "piper"
+    if priority >= ESPEAK_PRIORITY:
+        return "espeak"
+    if ESPEAK_MAX_CHARS > 0 and len(text.strip()) <= ESPEAK_MAX_CHARS:
+        return "espeak"
+    return "piper"
+
+def check_engine(name: str):
+    """Проверка движка из запроса"""
+    if name not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный движок: {name}")
+    if name == "espeak" and not espeak_available():
+        raise HTTPException(status_code=400, detail="Движок espeak недоступен")
+
+def engine_rate(engine: str, voice_name: str) -> int:
+    """Частота фрагментов, которые выдает synthesize_stream"""
+    if engine == "espeak":
+        return espeak_engine.sample_rate
+    return voice_pool.sample_rate(voice_name)
+
+def record_engine(engine: str, first_audio: Optional[float]):
+    """Учет текста, синтезированного движком"""
+    (engine_espeak_requests if engine == "espeak" else engine_piper_requests).inc()
+    with engine_lock:
+        stats = engine_stats[engine]
+        stats["requests"] += 1
+        if first_audio is not None:
+            stats["first_audio_seconds"] += first_audio
+            stats["last_first_audio"] = round(first_audio, 4)
+
+def engines_status() -> dict:
+    """Движки синтеза для /status"""
+    with engine_lock:
+        result = {}
+        for name, stats in engine_stats.items():
+            requests = stats["requests"]
+            result[name] = {
+                "requests": requests,
+                "avg_first_audio": round(stats["first_audio_seconds"] / requests, 4) if requests else None,
+                "last_first_audio": stats["last_first_audio"]
+            }
+    result["espeak"]["library"] = espeak_engine.stats() if espeak_engine is not None else None
+    result["auto"] = {"max_chars": ESPEAK_MAX_CHARS, "priority": ESPEAK_PRIORITY}
+    return result
+
+def synthesize_stream(text: str, voice_name: str = DEFAULT_VOICE, engine: str = "piper"):
+    """Потоковый синтез: фрагменты аудио (в частоте движка) выдаются по мере готовности"""
     try:
-        # Обрабатываем строки
         lines = [line.strip() for line in text.split('\n') if line.strip()]
+        if TEXT_NORMALIZE:
+            lines = [normalize_text(line) for line in lines]
         
         if not lines:
-            return None
+            return
         
-        all_audio_chunks = []
+        voice_rate = engine_rate(engine, voice_name)
+        started = time.perf_counter()
+        first_audio = None
         
-        for line in lines:
-            line_audio_chunks = []
-            for audio_chunk in voice.synthesize(line):
-                line_audio_chunks.append(audio_chunk.audio_int16_array)
-            
-            if line_audio_chunks:
-                line_audio = np.concatenate(line_audio_chunks)
-                all_audio_chunks.append(line_audio)
+        # Пауза в начале
+        yield np.zeros(int(LEAD_IN_SECONDS * voice_rate), dtype=np.int16)
         
-        if not all_audio_chunks:
-            return None
+        sentences = []
+        if engine == "espeak":
+            chunks = synthesize_espeak(lines)
+        else:
+            if parallel_synth is not None:
+                sentences = [s for line in lines for s in split_sentences(line)]
+            if len(sentences) >= PARALLEL_MIN_SENTENCES:
+                chunks = synthesize_parallel(sentences, voice_name)
+            else:
+                chunks = synthesize_lines(lines, voice_name)
         
-        audio_data = np.concatenate(all_audio_chunks)
+        try:
+            for chunk in chunks:
+                if first_audio is None:
+                    first_audio = time.perf_counter() - started
+                yield chunk
+        finally:
+            record_engine(engine, first_audio)
         
-        # Добавляем паузы
-        initial_silence = int(0.1 * samplerate)
-        end_silence = int(0.05 * samplerate)
+        # Пауза в конце
+        yield np.zeros(int(0.05 * voice_rate), dtype=np.int16)
         
-        silence_start = np.zeros(initial_silence, dtype=np.int16)
-        silence_end = np.zeros(end_silence, dtype=np.int16)
+    except Exception as e:
+        synthesis_errors.inc()
+        print(f"Ошибка при синтезе: {e}")
+
+def synthesize_lines(lines: list, voice_name: str):
+    """Последовательный синтез строк с кэшем фраз"""
+    model_path = voice_pool.model_path(voice_name)
+    voice = None
+    
+    for line in lines:
+        # Повторяющиеся фразы берем из кэша без запуска Piper
+        cache_key = make_key(line, model_path, dataclasses.asdict(syn_config))
+        line_audio = phrase_cache.get(cache_key)
+        if line_audio is not None:
+            yield line_audio
+            continue
         
-        audio_data = np.concatenate([silence_start, audio_data, silence_end])
+        # Модель нужна только при промахе кэша
+        if voice is None:
+            voice = voice_pool.get(voice_name)
         
-        return audio_data
+        # Один фрагмент на предложение; фонемы повторных предложений берутся
+        # из кэша. Время, пока потребитель держит фрагмент, в синтез не засчитывается
+        # Строка больше кэша в него все равно не попадет: фрагменты не копим,
+        # чтобы память не росла с длиной абзаца
+        line_audio_chunks = []
+        line_bytes = 0
+        synthesis_seconds = 0.0
+        for sentence in split_sentences(line):
+            started = time.perf_counter()
+            for phoneme_ids in phoneme_memo.phoneme_ids(voice, model_path, sentence):
+                chunk = ids_to_audio(voice, phoneme_ids, syn_config)
+                synthesis_seconds += time.perf_counter() - started
+                line_bytes += chunk.nbytes
+                if line_bytes <= phrase_cache.max_bytes:
+                    line_audio_chunks.append(chunk)
+                else:
+                    line_audio_chunks = None
+                yield chunk
+                started = time.perf_counter()
+            synthesis_seconds += time.perf_counter() - started
         
-    except Exception as e:
-        print(f"Ошибка при синтезе: {e}")
+        line_synthesis_hist.observe(synthesis_seconds)
+        if synthesis_seconds > 0:
+            chars_per_second_hist.observe(len(line) / synthesis_seconds)
+        
+        if line_audio_chunks and line_bytes <= phrase_cache.max_bytes:
+            phrase_cache.put(cache_key, np.concatenate(line_audio_chunks))
+
+def synthesize_espeak(lines: list):
+    """Синтез строк в espeak-ng; кэш фраз не нужен - синтез дешевле поиска"""
+    for line in lines:
+        started = time.perf_counter()
+        audio = espeak_engine.synthesize(line)
+        espeak_synthesis_hist.observe(time.perf_counter() - started)
+        if len(audio):
+            yield audio
+
+def synthesize_parallel(sentences: list, voice_name: str):
+    """Синтез предложений на пуле процессов с выдачей строго по порядку"""
+    model_path = voice_pool.model_path(voice_name)
+    config_path = voice_pool.config_path(voice_name)
+    params = dataclasses.asdict(syn_config)
+    keys = [make_key(sentence, model_path, params) for sentence in sentences]
+    
+    # Кэш проверяется лениво, по мере продвижения окна
+    jobs = ((phrase_cache.get(key), (model_path, config_path, sentence, params))
+            for key, sentence in zip(keys, sentences))
+    
+    for key, audio in zip(keys, parallel_synth.map_ordered(jobs)):
+        if len(audio):
+            phrase_cache.put(key, audio)
+            yield audio
+
+def synthesize_text(text: str, voice_name: str = DEFAULT_VOICE,
+                    engine: str = "piper") -> Optional[np.ndarray]:
+    """Синтез текста в аудиоданные"""
+    all_audio_chunks = list(synthesize_stream(text, voice_name, engine))
+    
+    # Только паузы - синтезировать было нечего
+    if len(all_audio_chunks) <= 2:
         return None
+    
+    return np.concatenate(all_audio_chunks)
 
-def audio_worker():
-    """Фоновый рабочий поток"""
-    global is_playing, stop_worker
-    player_counter = 0
+def wav_header(samplerate: int) -> bytes:
+    """WAV-заголовок для потока заранее неизвестной длины"""
+    # Размеры ставим максимальными: плееры читают такой файл до конца потока
+    data_size = 0xFFFFFFFF - 36
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 0xFFFFFFFF, b"WAVE",
+        b"fmt ", 16, 1, 1, samplerate, samplerate * 2, 2, 16,
+        b"data", data_size
+    )
+
+def audio_stream(text: str, voice_name: str, audio_format: str, engine: str = "piper"):
+    """Байты ответа /synthesize по мере синтеза, каждый фрагмент кодируется сразу"""
+    voice_rate = engine_rate(engine, voice_name)
+    codec = "pcm" if audio_format == "wav" else audio_format
+    encoder = make_encoder(codec, voice_rate)
+    started = time.monotonic()
+    
+    try:
+        if audio_format == "wav":
+            yield wav_header(voice_rate)
+        for chunk in synthesize_stream(text, voice_name, engine):
+            data = encoder.encode(chunk)
+            if data:
+                yield data
+        data = encoder.flush()
+        if data:
+            yield data
+    finally:
+        record_transfer(audio_format, encoder.stats(), time.monotonic() - started)
+
+def record_transfer(audio_format: str, stats: dict, seconds: float):
+    """Объем и стоимость кодирования одной сессии /synthesize"""
+    with transport_lock:
+        totals = transport_totals.setdefault(
+            audio_format, {"sessions": 0, "pcm_bytes": 0, "coded_bytes": 0, "cpu_seconds": 0.0})
+        totals["sessions"] += 1
+        totals["pcm_bytes"] += stats["pcm_bytes"]
+        totals["coded_bytes"] += stats["coded_bytes"]
+        totals["cpu_seconds"] = round(totals["cpu_seconds"] + stats["cpu_seconds"], 4)
+        recent_transfers.append({"format": audio_format, "seconds": round(seconds, 3), **stats})
+
+def transport_status() -> dict:
+    """Передача звука для /status"""
+    with transport_lock:
+        return {
+            "formats": ["wav"] + available_codecs(),
+            "totals": {k: dict(v) for k, v in transport_totals.items()},
+            "recent": list(recent_transfers)
+        }
+
+def playback_hooks(item):
+    """Обработчики начала и конца воспроизведения: события /events и метрики
+
+    Вызываются из callback аудиовыхода, поэтому только публикуют событие
+    и отмечают в очереди, что звук элемента доигран.
+    Если звук высказывания сброшен до выхода на устройство, on_start не
+    вызывается, и playback_end без парного playback_start не публикуется.
+    """
+    started = []
+    
+    def on_start():
+        started.append(time.monotonic())
+        audible_utterances.add(item.seq)
+        first_audio_hist.observe(started[0] - item.enqueued_at)
+        event_feed.publish("playback_start", utterance=item.seq, text=item.text,
+                           priority=item.priority)
+    
+    def on_end():
+        speech_queue.finished(item)
+        if not started:
+            return
+        audible_utterances.discard(item.seq)
+        playback_hist.observe(time.monotonic() - started[0])
+        event_feed.publish("playback_end", utterance=item.seq, interrupted=item.cancel.is_set())
     
-    while not stop_worker:
+    return on_start, on_end
+
+def audio_worker():
+    """Фоновый рабочий поток: синтез и передача звука в аудиовыход"""
+    while True:
+        item = speech_queue.get()
+        
+        if item is None:
+            break
+        
+        engine = choose_engine(item.engine, item.text, item.priority)
+        voice_rate = engine_rate(engine, item.voice)
+        queue_wait_hist.observe(time.monotonic() - item.enqueued_at)
+        on_start, on_end = playback_hooks(item)
+        
         try:
-            text = audio_queue.get(timeout=0.1)
-            
-            if text is None:
-                break
-            
-            # Ждем завершения текущего воспроизведения
-            if is_playing:
-                while is_playing and not stop_worker:
-                    time.sleep(0.1)
-                time.sleep(0.2)
-            
-            # Синтезируем и воспроизводим
-            audio_data = synthesize_text(text)
-            
-            if audio_data is not None and len(audio_data) > 0:
-                player_counter += 1
-                player = AudioPlayerThread(audio_data, samplerate, player_counter)
-                player.start()
-                time.sleep(0.05)
-            
-            audio_queue.task_done()
-            
-        except queue.Empty:
-            continue
+            playback_engine.begin_utterance(item.seq)
+            try:
+                # on_start привязан к первому синтезированному звуку, а не к
+                # паузе в начале: время до первого звука включает синтез
+                if STREAMING_MODE:
+                    # Синтез следующего предложения идет параллельно с
+                    # воспроизведением текущего; write блокируется при полном буфере
+                    stream = synthesize_stream(item.text, item.voice, engine)
+                    for i, chunk in enumerate(stream):
+                        if item.cancel.is_set():
+                            stream.close()
+                            break
+                        # Фрагмент 0 - пауза в начале
+                        playback_engine.write(resample(chunk, voice_rate, samplerate),
+                                              on_start if i == 1 else None)
+                else:
+                    audio_data = synthesize_text(item.text, item.voice, engine)
+                    if audio_data is not None and not item.cancel.is_set():
+                        audio_data = resample(audio_data, voice_rate, samplerate)
+                        lead_in = int(LEAD_IN_SECONDS * samplerate)
+                        playback_engine.write(audio_data[:lead_in])
+                        playback_engine.write(audio_data[lead_in:], on_start)
+                
+                # Фрагмент мог попасть в буфер уже после сброса по /stop
+                if item.cancel.is_set():
+                    playback_engine.flush(item.seq)
+            finally:
+                # Следующий текст синтезируется сразу, без ожидания конца воспроизведения
+                playback_engine.end_utterance(on_end)
         except Exception as e:
+            worker_errors.inc()
             print(f"Ошибка в аудио-воркере: {e}")
+        finally:
+            speech_queue.task_done(item)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan контекстный менеджер"""
     print("Запуск сервера TTS...")
+    event_feed.bind(asyncio.get_running_loop())
+    
+    global parallel_synth
+    if PARALLEL_WORKERS > 0:
+        parallel_synth = ParallelSynthesizer(PARALLEL_WORKERS)
+        print(f"Параллельный синтез: {PARALLEL_WORKERS} процессов")
+    
+    # Голос по умолчанию загружаем сразу, остальные - при первом запросе
+    load_started = time.monotonic()
+    voice = voice_pool.get(DEFAULT_VOICE)
+    startup_info["voice_load_seconds"] = round(time.monotonic() - load_started, 3)
+    
+    if WARMUP_ENABLED:
+        # Первый прогон инициализирует espeak-ng и аллокаторы ONNX Runtime;
+        # кэши фраз и фонем не трогаем
+        warmup_started = time.monotonic()
+        for _ in voice.synthesize(WARMUP_TEXT, syn_config=syn_config):
+            pass
+        startup_info["warmup_seconds"] = round(time.monotonic() - warmup_started, 3)
+    
+    # Библиотека espeak-ng загружается заранее, чтобы первый срочный текст не ждал
+    if espeak_engine is not None:
+        startup_info["espeak"] = espeak_engine.available()
+    
+    playback_engine.start()
     
     global audio_thread
     audio_thread = threading.Thread(target=audio_worker, daemon=True)
     audio_thread.start()
     
+    startup_info["startup_seconds"] = round(time.monotonic() - STARTED_AT, 3)
+    print(f"Сервер готов за {startup_info['startup_seconds']:.2f} с "
+          f"(загрузка голоса {startup_info['voice_load_seconds']:.2f} с, "
+          f"прогрев {startup_info.get('warmup_seconds', 0):.2f} с)")
+    
     yield
     
     print("Остановка сервера TTS...")
     
-    global stop_worker
-    stop_worker = True
-    
-    while not audio_queue.empty():
-        try:
-            audio_queue.get_nowait()
-            audio_queue.task_done()
-        except:
-            pass
-    
-    time.sleep(1.0)
+    # Воркер может ждать места в буфере - закрытие выхода его освобождает
+    speech_queue.close()
+    playback_engine.close()
+    audio_thread.join(timeout=5.0)
+    if parallel_synth is not None:
+        parallel_synth.shutdown()
     print("Сервер остановлен")
 
 # Создаем FastAPI приложение
 app = FastAPI(lifespan=lifespan)
 
+def resolve_voice(name: Optional[str]) -> str:
+    """Проверка имени голоса из запроса"""
+    if name is None:
+        return DEFAULT_VOICE
+    if name not in voice_pool:
+        raise HTTPException(status_code=404, detail=f"Неизвестный голос: {name}")
+    return name
+
 @app.post("/say")
-async def say_text(request: TTSRequest, background_tasks: BackgroundTasks):
+async def say_text(request: SayRequest):
     """Обработка запроса на синтез речи"""
-    background_tasks.add_task(lambda: audio_queue.put(request.text))
-    return {"status": "processing", "text": request.text}
+    voice_name = resolve_voice(request.voice)
+    if not PRIORITY_LOW <= request.priority <= PRIORITY_URGENT:
+        raise HTTPException(status_code=400, detail=f"Неизвестный приоритет: {request.priority}")
+    check_engine(request.engine)
+    say_requests.inc()
+    
+    preempt = request.preempt or request.priority >= PREEMPT_PRIORITY
+    item, coalesced, cancelled = speech_queue.put(request.text, voice_name, request.priority,
+                                                  request.ttl, preempt, request.engine)
+    # Звук прерванных высказываний, уже лежащий в буфере, сбрасываем сразу
+    for cancelled_item in cancelled:
+        playback_engine.flush(cancelled_item.seq)
+    
+    return {
+        "status": "coalesced" if coalesced else "processing",
+        "text": request.text,
+        "voice": voice_name,
+        "priority": item.priority
+    }
+
+@app.post("/stop")
+async def stop_speech(request: StopRequest = StopRequest()):
+    """Прерывание текущего высказывания (и очистка очереди по запросу)"""
+    cancelled, dropped = speech_queue.stop(request.clear)
+    for item in cancelled:
+        playback_engine.flush(item.seq)
+    return {"status": "stopped", "dropped": dropped}
+
+@app.post("/synthesize")
+async def synthesize(request: SynthesizeRequest):
+    """Потоковая отдача синтезированного звука клиенту"""
+    voice_name = resolve_voice(request.voice)
+    check_engine(request.engine)
+    engine = choose_engine(request.engine, request.text)
+    voice_rate = engine_rate(engine, voice_name)
+    synthesize_requests.inc()
+    
+    if request.format not in MEDIA_TYPES or (
+            request.format != "wav" and request.format not in available_codecs()):
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {request.format}")
+    media_type = MEDIA_TYPES[request.format].format(rate=voice_rate)
+    
+    headers = {
+        "X-Sample-Rate": str(voice_rate),
+        "X-Channels": "1",
+        "X-Sample-Format": "s16le",
+        "X-Encoding": request.format,
+        "X-Engine": engine
+    }
+    # Синхронный генератор Starlette обходит в пуле потоков,
+    # поэтому синтез не блокирует цикл событий
+    return StreamingResponse(
+        audio_stream(request.text, voice_name, request.format, engine),
+        media_type=media_type,
+        headers=headers
+    )
 
 @app.get("/status")
 async def get_status():
     """Получение статуса сервера"""
     return {
         "status": "running",
-        "is_playing": is_playing,
-        "queue_size": audio_queue.qsize(),
-        "samplerate": samplerate
+        "is_playing": playback_engine.is_playing,
+        "events": event_feed.stats(),
+        "queue_size": speech_queue.qsize(),
+        "queue": speech_queue.stats(),
+        "samplerate": samplerate,
+        "startup": {
+            **startup_info,
+            "optimized_cache": voice_pool.info[DEFAULT_VOICE]["optimized_cache"],
+            "ort": {
+                "intra_threads": ORT_INTRA_THREADS,
+                "inter_threads": ORT_INTER_THREADS,
+                "opt_level": ORT_OPT_LEVEL
+            }
+        },
+        "cache": phrase_cache.stats(),
+        "phoneme_memo": phoneme_memo.stats(),
+        "engines": engines_status(),
+        "transport": transport_status(),
+        "audio": {"backend": audio_io.BACKEND, "sim": audio_io.sim_report()},
+        "voices": voice_pool.stats()
     }
 
+@app.get("/events")
+async def get_events():
+    """События воспроизведения (SSE): playback_start и playback_end"""
+    # Только звучащие высказывания: для них playback_end придет обязательно,
+    # а синтезируемое может так и не зазвучать
+    initial = {"type": "state", "speaking": bool(audible_utterances), "time": time.time()}
+    return StreamingResponse(event_feed.sse(initial), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.get("/metrics")
+async def get_metrics():
+    """Счетчики и гистограммы в текстовом формате Prometheus"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Метрики выключены (TTS_METRICS=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/voices")
+async def get_voices():
+    """Список голосов, их время загрузки и занимаемая память"""
+    return {"default": DEFAULT_VOICE, **voice_pool.stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+import glob
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import onnxruntime
+from piper import PiperVoice
+from piper.config import PiperConfig
+
+# Уровни оптимизации графа ONNX Runtime по имени
+GRAPH_OPT_LEVELS = {
+    "disable": onnxruntime.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def current_rss() -> int:
+    """Резидентная память процесса в байтах (Linux)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def discover_voices(voices_dir: str) -> dict:
+    """Поиск голосов: каждая модель *.onnx с файлом конфигурации *.onnx.json"""
+    registry = {}
+    for model_path in sorted(glob.glob(os.path.join(voices_dir, "*.onnx"))):
+        config_path = model_path + ".json"
+        if os.path.exists(config_path):
+            name = os.path.basename(model_path)[:-len(".onnx")]
+            registry[name] = {"model": model_path, "config": config_path}
+    return registry
+
+
+def optimized_model_path(optimized_dir: str, model_path: str, opt_level: str) -> str:
+    """Файл оптимизированной модели; версия ONNX Runtime входит в имя"""
+    name = os.path.basename(model_path)[:-len(".onnx")]
+    return os.path.join(optimized_dir, f"{name}.{opt_level}.ort{onnxruntime.__version__}.onnx")
+
+
+class VoicePool:
+    """Пул голосов Piper: загрузка при первом обращении и LRU в пределах бюджета памяти
+
+    intra_threads/inter_threads - потоки ONNX Runtime (0 - по умолчанию),
+    opt_level - уровень оптимизации графа, optimized_dir - каталог, куда
+    сохраняется оптимизированная модель, чтобы следующий запуск ее не оптимизировал.
+    """
+    def __init__(self, registry: dict, max_bytes: int, intra_threads: int = 0,
+                 inter_threads: int = 0, opt_level: str = "all",
+                 optimized_dir: Optional[str] = None):
+        if opt_level not in GRAPH_OPT_LEVELS:
+            raise ValueError(f"Неизвестный уровень оптимизации: {opt_level}")
+        self.registry = registry
+        self.max_bytes = max_bytes
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self.opt_level = opt_level
+        self.optimized_dir = optimized_dir
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.loaded = OrderedDict()  # имя -> PiperVoice
+        self.info = {name: {"loads": 0, "load_seconds": None, "memory_bytes": None,
+                            "uses": 0, "evictions": 0, "optimized_cache": None}
+                     for name in registry}
+        self.sample_rates = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.registry
+
+    def model_path(self, name: str) -> str:
+        return self.registry[name]["model"]
+
+    def config_path(self, name: str) -> str:
+        return self.registry[name]["config"]
+
+    def sample_rate(self, name: str) -> int:
+        """Частота голоса по его конфигурации, без загрузки модели"""
+        if name not in self.sample_rates:
+            with open(self.registry[name]["config"], encoding="utf-8") as f:
+                self.sample_rates[name] = json.load(f)["audio"]["sample_rate"]
+        return self.sample_rates[name]
+
+    def loaded_bytes(self) -> int:
+        """Вызывать под lock"""
+        return sum(self.info[name]["memory_bytes"] or 0 for name in self.loaded)
+
+    def _load(self, name: str) -> PiperVoice:
+        """Создание сессии ONNX Runtime с настройками пула"""
+        entry = self.registry[name]
+        with open(entry["config"], encoding="utf-8") as f:
+            config = PiperConfig.from_dict(json.load(f))
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_threads
+        options.inter_op_num_threads = self.inter_threads
+        options.graph_optimization_level = GRAPH_OPT_LEVELS[self.opt_level]
+
+        model_path = entry["model"]
+        cache_state = None
+        if self.optimized_dir:
+            optimized = optimized_model_path(self.optimized_dir, model_path, self.opt_level)
+            if (os.path.exists(optimized)
+                    and os.path.getmtime(optimized) >= os.path.getmtime(model_path)):
+                # Граф уже оптимизирован - повторно на старте не тратим время
+                model_path = optimized
+                options.graph_optimization_level = GRAPH_OPT_LEVELS["disable"]
+                cache_state = "hit"
+            else:
+                os.makedirs(self.optimized_dir, exist_ok=True)
+                options.optimized_model_filepath = optimized
+                cache_state = "saved"
+
+        try:
+            session = onnxruntime.InferenceSession(
+                model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        except Exception as e:
+            if cache_state != "hit":
+                raise
+            # Испорченный файл оптимизированной модели - загружаем исходную
+            print(f"Ошибка загрузки оптимизированной модели {model_path}: {e}")
+            os.remove(model_path)
+            return self._load(name)
+
+        self.info[name]["optimized_cache"] = cache_state
+        return PiperVoice(session=session, config=config)
+
+    def get(self, name: str) -> PiperVoice:
+        """Голос по имени; при необходимости загружается с вытеснением старых"""
+        with self.lock:
+            voice = self.loaded.get(name)
+            if voice is not None:
+                self.loaded.move_to_end(name)
+                self.info[name]["uses"] += 1
+                return voice
+
+        # Загрузки идут по одной, чтобы замер памяти относился к одной модели
+        with self.load_lock:
+            with self.lock:
+                voice = self.loaded.get(name)
+                if voice is not None:
+                    self.loaded.move_to_end(name)
+                    self.info[name]["uses"] += 1
+                    return voice
+
+            entry = self.registry[name]
+            estimate = os.path.getsize(entry["model"])
+            self.evict_for(estimate, keep=name)
+
+            rss_before = current_rss()
+            start = time.monotonic()
+            voice = self._load(name)
+            load_seconds = time.monotonic() - start
+            # Аллокатор может переиспользовать освобожденную память,
+            # поэтому не считаем модель меньше ее файла
+            memory_bytes = max(current_rss() - rss_before, estimate)
+
+            print(f"Голос {name} загружен за {load_seconds:.2f} с, "
+                  f"~{memory_bytes / 1024 / 1024:.0f} МБ")
+
+            with self.lock:
+                self.loaded[name] = voice
+                info = self.info[name]
+                info["loads"] += 1
+                info["load_seconds"] = round(load_seconds, 3)
+                info["memory_bytes"] = memory_bytes
+                info["uses"] += 1
+            return voice
+
+    def evict_for(self, needed_bytes: int, keep: Optional[str] = None):
+        """Вытеснение давно не использованных голосов, чтобы уложиться в бюджет"""
+        with self.lock:
+            while self.loaded and self.loaded_bytes() + needed_bytes > self.max_bytes:
+                name = next(iter(self.loaded))
+                if name == keep:
+                    break
+                # Синтез, уже получивший голос, доработает со своей ссылкой
+                del self.loaded[name]
+                self.info[name]["evictions"] += 1
+                print(f"Голос {name} выгружен из памяти")
+
+    def stats(self) -> dict:
+        """Состояние пула для /status и /voices"""
+        with self.lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "loaded_bytes": self.loaded_bytes(),
+                "loaded": list(self.loaded),
+                "voices": {name: dict(info, loaded=name in self.loaded)
+                           for name, info in self.info.items()},
+            }
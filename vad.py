@@ -0,0 +1,106 @@
+"""Детектор речи (VAD) перед распознавателем Vosk.
+
+Блоки тишины не передаются в KaldiRecognizer, поэтому декодер не тратит
+процессор, пока в комнате никто не говорит. Детектор подключаемый: VADGate
+работает с любым объектом, у которого есть метод is_speech(samples) -> bool.
+"""
+from collections import deque
+
+import numpy as np
+
+FULL_SCALE = 32768.0
+
+
+class EnergyDetector:
+    """Энергетический детектор с адаптивной оценкой уровня шума
+
+    Фон оценивается по нижнему перцентилю уровней кадров каждого блока: паузы
+    между словами есть и в блоках с речью, поэтому фон отслеживается все время.
+    Вниз оценка идет сразу, вверх - с шагом noise_adapt.
+    """
+    def __init__(self, samplerate, frame_ms=30, margin_db=10.0, min_level_db=-55.0,
+                 min_speech_frames=3, noise_adapt=0.1, noise_percentile=10):
+        self.frame_len = int(samplerate * frame_ms / 1000)
+        self.margin_db = margin_db  # Насколько речь громче шума
+        self.min_level_db = min_level_db  # Ниже этого уровня речи не бывает
+        self.min_speech_frames = min_speech_frames
+        self.noise_adapt = noise_adapt
+        self.noise_percentile = noise_percentile
+        self.noise_db = None
+
+    def frame_levels(self, samples):
+        """Уровень каждого кадра блока в dBFS (векторно, без цикла по кадрам)"""
+        n_frames = len(samples) // self.frame_len
+        if n_frames == 0:
+            return np.empty(0, dtype=np.float32)
+        frames = samples[:n_frames * self.frame_len].astype(np.float32).reshape(n_frames, self.frame_len)
+        energy = np.mean(frames * frames, axis=1) / (FULL_SCALE * FULL_SCALE)
+        return 10.0 * np.log10(energy + 1e-12)
+
+    def is_speech(self, samples):
+        levels = self.frame_levels(samples)
+        if len(levels) == 0:
+            return False
+
+        low = float(np.percentile(levels, self.noise_percentile))
+        if self.noise_db is None:
+            # Захват может начаться посреди речи: начальный фон не выше min_level_db
+            self.noise_db = min(low, self.min_level_db)
+        elif low < self.noise_db:
+            self.noise_db = low
+        else:
+            self.noise_db += self.noise_adapt * (low - self.noise_db)
+
+        threshold = max(self.noise_db + self.margin_db, self.min_level_db)
+        return np.count_nonzero(levels > threshold) >= self.min_speech_frames
+
+
+class VADGate:
+    """Ворота между захватом звука и распознавателем
+
+    process() возвращает блоки, которые нужно отдать распознавателю, и признак
+    конца фразы, по которому распознаватель следует финализировать.
+    """
+    def __init__(self, detector, preroll_blocks=1, hangover_blocks=2):
+        self.detector = detector
+        # Начало фразы обычно тише порога - держим несколько блоков до речи
+        self.preroll = deque(maxlen=preroll_blocks)
+        self.hangover_blocks = hangover_blocks
+        self.hangover_left = 0
+        self.in_speech = False
+
+        self.total_samples = 0
+        self.gated_samples = 0
+
+    def process(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)
+        self.total_samples += len(samples)
+
+        if self.detector.is_speech(samples):
+            blocks = list(self.preroll) + [data]
+            # Блоки предыстории все-таки пошли в распознаватель
+            self.gated_samples -= sum(len(b) for b in self.preroll) // 2
+            self.preroll.clear()
+            self.in_speech = True
+            self.hangover_left = self.hangover_blocks
+            return blocks, False
+
+        if self.in_speech and self.hangover_left > 0:
+            # Паузы внутри фразы не обрывают ее
+            self.hangover_left -= 1
+            return [data], False
+
+        ended = self.in_speech
+        self.in_speech = False
+
+        # Самый старый блок предыстории вытесняется и отсекается окончательно
+        self.preroll.append(data)
+        self.gated_samples += len(samples)
+        return [], ended
+
+    @property
+    def gated_fraction(self):
+        """Доля звука, не дошедшая до распознавателя"""
+        if self.total_samples == 0:
+            return 0.0
+        return self.gated_samples / self.total_samples
@@ -2,11 +2,13 @@
 #include <vector>
 #include <string>
 #include <cstring>
+#include <cstdlib>
+#include <csignal>
 #include <portaudio.h>
 #include "vosk_api.h"
 
 #define SAMPLE_RATE 16000
-#define FRAMES_PER_BUFFER 2048  // Увеличенный буфер для предотвращения лагов
+#define FRAMES_PER_BUFFER 2048  // Размер блока по умолчанию, переопределяется VOSK_BLOCK_FRAMES
 
 // Макрос для проверки ошибок PortAudio
 #define CHECK_PA_ERROR(err) if(err != paNoError && err != paInputOverflowed) { \
@@ -14,6 +16,25 @@
     return -1; \
 }
 
+// Флаг остановки по Ctrl+C, чтобы корректно освободить ресурсы
+static volatile std::sig_atomic_t running = 1;
+
+void handle_sigint(int) {
+    running = 0;
+}
+
+// Размер блока: меньше - ниже задержка, больше - меньше нагрузка на процессор
+unsigned long read_block_frames() {
+    const char* env = std::getenv("VOSK_BLOCK_FRAMES");
+    if (env) {
+        long value = std::strtol(env, nullptr, 10);
+        if (value > 0) {
+            return static_cast<unsigned long>(value);
+        }
+    }
+    return FRAMES_PER_BUFFER;
+}
+
 // Функция для безопасного извлечения текста из JSON строки Vosk
 void print_recognized_text(const char* json_raw) {
     std::string res = json_raw;
@@ -71,25 +92,38 @@ int main() {
     inputParameters.hostApiSpecificStreamInfo = NULL;
 
     PaStream *stream;
-    CHECK_PA_ERROR(Pa_OpenStream(&stream, &inputParameters, NULL, SAMPLE_RATE, FRAMES_PER_BUFFER, paClipOff, NULL, NULL));
+    unsigned long blockFrames = read_block_frames();
+
+    CHECK_PA_ERROR(Pa_OpenStream(&stream, &inputParameters, NULL, SAMPLE_RATE, blockFrames, paClipOff, NULL, NULL));
     CHECK_PA_ERROR(Pa_StartStream(stream));
 
+    std::signal(SIGINT, handle_sigint);
+
     std::cout << "\n--- СИСТЕМА ГОТОВА. ГОВОРИТЕ... (Ctrl+C для выхода) ---\n" << std::endl;
+    std::cout << "Размер блока: " << blockFrames << " кадров" << std::endl;
 
-    std::vector<short> buffer(FRAMES_PER_BUFFER);
+    // Буфер выделяется один раз; Pa_ReadStream пишет прямо в него
+    std::vector<short> buffer(blockFrames);
+    unsigned long overflows = 0;
+    unsigned long long blocks = 0;
 
-    while (true) {
+    while (running) {
         // Чтение аудиоданных
-        PaError err = Pa_ReadStream(stream, buffer.data(), FRAMES_PER_BUFFER);
+        PaError err = Pa_ReadStream(stream, buffer.data(), blockFrames);
         
-        // На одноплатниках overflow — обычное дело, просто игнорируем его
-        if (err != paNoError && err != paInputOverflowed) {
+        // На одноплатниках overflow — обычное дело: данные PortAudio
+        // потеряны, но очередь не растет; считаем такие случаи
+        if (err == paInputOverflowed) {
+            overflows++;
+            std::cerr << "\rПереполнение входного буфера (всего: " << overflows << ")" << std::endl;
+        } else if (err != paNoError) {
             std::cerr << "Критическая ошибка аудио: " << Pa_GetErrorText(err) << std::endl;
             break;
         }
+        blocks++;
 
         // Передача данных в нейросеть
-        int is_final = vosk_recognizer_accept_waveform_s(recognizer, buffer.data(), FRAMES_PER_BUFFER);
+        int is_final = vosk_recognizer_accept_waveform_s(recognizer, buffer.data(), blockFrames);
         
         if (is_final) {
             print_recognized_text(vosk_recognizer_result(recognizer));
@@ -99,6 +133,8 @@ int main() {
         }
     }
 
+    std::cout << "\nБлоков: " << blocks << ", переполнений: " << overflows << std::endl;
+
     // 3. Очистка
     Pa_StopStream(stream);
     Pa_CloseStream(stream);